@@ -0,0 +1,72 @@
+import argparse
+from common.ybconnection import YBConnection
+from common.event_log import configure_logging
+from common.cluster_helper import ClusterHelper
+from common.arguments import add_logging_arguments, add_payload_arguments, create_payload, add_distribution_arguments, set_access_distributions
+from common.async_engine import AsyncExecutor
+from async_workloads import AsyncSelectWorkload, AsyncSimpleWorkload, AsyncSimpleWorkloadSequentialAccess
+
+class Main:
+    # Runs workloads on the asyncio engine instead of locust. This is a separate entry point because locust
+    # monkey-patches the standard library for gevent as soon as it is imported.
+    # Setup and cleanup are done with workload_runner.py.
+    # Example usage (see below for overrides):
+    # Execute: python3 async_workload_runner.py --workload simple --num_users 10000 --spawn_rate 200 --execution_time 600
+
+    def __init__(self):
+        # List of available workloads
+        self.workloads = {'simple': AsyncSimpleWorkload, 'select': AsyncSelectWorkload, 'simple_sequential': AsyncSimpleWorkloadSequentialAccess}
+
+    def parse_arguments(self):
+        parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        parser.add_argument('--host', default=None,
+                            help="Host (default to localhost if not specified)")
+        parser.add_argument('--port', default=None,
+                            help="Port (default to 5433 if not specified)")
+        parser.add_argument('--dbuser', default="yugabyte",
+                            help="Database user to connect as")
+        parser.add_argument('--dbpass', default="yugabyte",
+                            help="Password for dbuser")
+        parser.add_argument('--ipv6', action='store_true',
+                            help="Use ipv6 (default is false)")
+        parser.add_argument('--initialdb', default='yugabyte',
+                            type=str.lower,
+                            help="Initial database to connect to")
+        add_logging_arguments(parser)
+        parser.add_argument('--workload',
+                            choices=self.workloads.keys(), required=True,
+                            help="Workload to run")
+        parser.add_argument('--num_users', default=100,
+                            type=int,
+                            help="Number of concurrent sessions")
+        parser.add_argument('--spawn_rate', default=10,
+                            type=float,
+                            help="Spawn rate (sessions / sec)")
+        parser.add_argument('--execution_time', default=600,
+                            type=int,
+                            help="Execution time in secs")
+        parser.add_argument('--csv', default=None,
+                            help="CSV file base name")
+        parser.add_argument('--schema_manifest', default=None,
+                            help="Cache the discovered databases and tables in this file and reuse it while the schema is unchanged")
+        add_payload_arguments(parser)
+        add_distribution_arguments(parser)
+        return parser.parse_args()
+
+    def main(self):
+        args = self.parse_arguments()
+        configure_logging(args.log_level, args.log_event_levels, args.log_sample_rate, args.log_buffered)
+
+        # Create yb connection object
+        ybconnection = YBConnection(args.host, args.port, args.dbuser, args.dbpass, args.ipv6)
+
+        cluster_helper = ClusterHelper(ybconnection, args.initialdb)
+        set_access_distributions(cluster_helper, args)
+
+        workload_runner = AsyncExecutor(cluster_helper, self.workloads[args.workload], args.csv,
+                                        payload=create_payload(args),
+                                        schema_manifest=args.schema_manifest)
+        workload_runner.execute(args.num_users, args.spawn_rate, args.execution_time)
+
+if __name__ == "__main__":
+    Main().main()
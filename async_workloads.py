@@ -0,0 +1,76 @@
+from common.event_log import request_log, connect_log
+from common.async_engine import AsyncUser
+from common.workload_config import workload_config
+
+""" Asyncio versions of the simple, select and simple_sequential workloads, with the same task mixes and wait times.
+    asyncpg executes every statement through its per-connection prepared statement cache.
+"""
+class _AsyncTenantWorkload(AsyncUser):
+    def __init__(self, executor):
+        super().__init__(executor)
+        self.conn = None
+
+    def _next_table_name(self):
+        return workload_config.cluster_helper.get_random_table_name(workload_config.num_tables)
+
+    async def insert_row(self):
+        # Inserts a row into a table
+        table_name = self._next_table_name()
+        try:
+            ret, latency_ms = await self.timed('insert_row', 'execute', self.conn.execute(f'INSERT INTO {table_name} (v1, v2, v3) VALUES ($1, $2, $3)',
+                *workload_config.payload.row()))
+            request_log.info('Inserted row into table %s. Latency: %d ms', table_name, latency_ms)
+        except Exception as e:
+            request_log.error('Failed to insert row: %s', e)
+
+    async def read_row(self):
+        # Reads from a table
+        table_name = self._next_table_name()
+        try:
+            ret, latency_ms = await self.timed('select', 'execute', self.conn.fetchval(f'SELECT count(*) FROM {table_name}'))
+            request_log.info('Selected from table %s. Latency: %d ms', table_name, latency_ms)
+        except Exception as e:
+            request_log.error('Failed to select from row: %s', e)
+
+    async def change_app(self):
+        # If only one database, this is a no-op
+        if (self.conn is not None and workload_config.num_databases == 1):
+            return
+
+        # Change the tenant app
+        if (self.conn is not None):
+            await self.conn.close()
+            self.conn = None
+
+        dbname = workload_config.cluster_helper.get_random_db_name(workload_config.num_databases)
+        self.conn, latency_ms = await self.timed('connect', 'get_connection', self.connect(dbname))
+        connect_log.info('Connected to database %s. Latency: %d', dbname, latency_ms)
+
+    async def on_start(self):
+        await self.change_app()
+
+    async def on_stop(self):
+        if (self.conn is not None):
+            await self.conn.close()
+            self.conn = None
+
+class AsyncSimpleWorkload(_AsyncTenantWorkload):
+    tasks = {'insert_row': 40, 'read_row': 60, 'change_app': 1}
+    wait_time = (0.5, 2)
+
+class AsyncSelectWorkload(_AsyncTenantWorkload):
+    tasks = {'read_row': 99, 'change_app': 1}
+    wait_time = (0.1, 0.5)
+
+class AsyncSimpleWorkloadSequentialAccess(_AsyncTenantWorkload):
+    tasks = {'insert_row': 40, 'read_row': 60, 'change_app': 1}
+
+    def __init__(self, executor):
+        super().__init__(executor)
+        self.cur_table = 1
+
+    def _next_table_name(self):
+        table_name = workload_config.cluster_helper.get_table_name_at(self.cur_table)
+        self.cur_table = (self.cur_table + 1) % workload_config.num_tables
+        self.cur_table += 1 if (self.cur_table == 0) else 0
+        return table_name
@@ -0,0 +1,153 @@
+import time
+import psycopg2.errors
+from common.event_log import request_log, connect_log
+from common.timing_wrapper import TimingWrapper
+from common.statements import INSERT_ROW, Statement
+from locust import User, task, between
+from common.workload_config import workload_config
+
+""" A workload that writes in batches: multi-row INSERT statements and explicit transactions of single-row inserts,
+    both of --batch_size rows. Inserts and transactions that hit a conflict are retried (transactions after rolling
+    back) up to --max_retries times; conflicts and retries are reported as their own request types.
+"""
+# Errors that abort a transaction because of concurrent access and are safe to retry
+RETRYABLE_ERRORS = (psycopg2.errors.SerializationFailure, psycopg2.errors.DeadlockDetected)
+
+ISOLATION_LEVELS = {'read_committed': 'READ COMMITTED', 'repeatable_read': 'REPEATABLE READ', 'serializable': 'SERIALIZABLE'}
+
+# Multi-row insert statements by number of rows
+_multi_row_inserts = {}
+
+def _get_multi_row_insert(num_rows):
+    statement = _multi_row_inserts.get(num_rows)
+    if (statement is None):
+        values = ', '.join(['(%s, %s, %s)'] * num_rows)
+        statement = _multi_row_inserts[num_rows] = Statement(f'multi_row_insert_{num_rows}', f'INSERT INTO {{table}} (v1, v2, v3) VALUES {values}',
+                                                             INSERT_ROW.param_types * num_rows)
+    return statement
+
+class BatchWorkload(User):
+    def __init__(self, environment):
+        super().__init__(environment)
+        self.conn = None
+        self.curs = None
+        self.connect_timer = TimingWrapper(environment, workload_config.cluster_helper.ybconnection, 'connect')
+        self.batch_insert_timer = TimingWrapper(environment, None, 'batch_insert')
+
+    # Wait time between each task
+    wait_time = between(0.1, 0.5)
+
+    def _report(self, request_type, name, exception = None):
+        # Count-only stats entry for conflicts and retries
+        self.environment.events.request.fire(request_type=request_type, name=name, start_time=time.time(), response_time=0,
+                                             response_length=0, exception=exception, context=None, response=None)
+
+    def _report_timed(self, request_type, name, start_perf_counter, exception = None):
+        # Reports a request timed here, from its open loop intended start and into the latency log like TimingWrapper does
+        end_perf_counter = time.perf_counter()
+        if (exception is None and TimingWrapper.start_time_source is not None):
+            intended_start = TimingWrapper.start_time_source()
+            if (intended_start is not None and intended_start < start_perf_counter):
+                start_perf_counter = intended_start
+        response_time = (end_perf_counter - start_perf_counter) * 1000
+        if (exception is None and TimingWrapper.recorder is not None):
+            TimingWrapper.recorder.record(request_type, name, response_time)
+        self.environment.events.request.fire(request_type=request_type, name=name, start_time=time.time() - response_time / 1000,
+                                             response_time=response_time, response_length=0, exception=exception, context=None, response=None)
+        return response_time
+
+    def _run_with_retries(self, name, func, *args):
+        # Runs func, retrying it up to --max_retries times when it hits a conflict. Returns the number of retries.
+        for attempt in range(workload_config.max_retries + 1):
+            try:
+                func(*args)
+                return attempt
+            except RETRYABLE_ERRORS as e:
+                self._report('conflict', name, e)
+                if (attempt == workload_config.max_retries):
+                    raise
+                self._report('retry', name)
+
+    def _insert_batch(self, table_name):
+        params = tuple(value for _ in range(workload_config.batch_size) for value in workload_config.payload.row())
+        sql, params = workload_config.statements.bind(self.environment, self.curs, _get_multi_row_insert(workload_config.batch_size), table_name, params)
+        self.batch_insert_timer.execute(sql, params)
+
+    @task(50)
+    def batch_insert(self):
+        # Inserts a batch of rows into a random table with one multi-row statement, which commits on its own
+        table_name = workload_config.cluster_helper.get_random_table_name(workload_config.num_tables)
+        start_perf_counter = time.perf_counter()
+        try:
+            retries = self._run_with_retries('batch_insert', self._insert_batch, table_name)
+            request_log.info('Inserted %s rows into table %s after %s retries. Latency: %d ms', workload_config.batch_size, table_name, retries,
+                             (time.perf_counter() - start_perf_counter) * 1000)
+        except Exception as e:
+            # The timer only reports statements that succeeded
+            self._report_timed('batch_insert', 'execute', start_perf_counter, e)
+            request_log.error('Failed to insert batch: %s', e)
+
+    def _insert_transaction(self, table_name):
+        # Inserts a batch of rows one statement at a time in an explicit transaction
+        isolation_level = ISOLATION_LEVELS[workload_config.isolation_level]
+        try:
+            self.curs.execute(f'BEGIN ISOLATION LEVEL {isolation_level}')
+            for _ in range(workload_config.batch_size):
+                sql, params = workload_config.statements.bind(self.environment, self.curs, INSERT_ROW, table_name, workload_config.payload.row())
+                self.curs.execute(sql, params)
+            self.curs.execute('COMMIT')
+        except Exception:
+            self._rollback()
+            raise
+
+    def _rollback(self):
+        # Don't let a failed rollback (e.g. on a broken connection) mask the error that aborted the transaction.
+        # The connection is in autocommit mode, where conn.rollback() doesn't end a transaction opened with BEGIN.
+        try:
+            self.curs.execute('ROLLBACK')
+        except Exception as e:
+            request_log.error('Failed to roll back transaction: %s', e)
+
+    @task(50)
+    def transaction(self):
+        table_name = workload_config.cluster_helper.get_random_table_name(workload_config.num_tables)
+        start_perf_counter = time.perf_counter()
+        try:
+            retries = self._run_with_retries('run_transaction', self._insert_transaction, table_name)
+        except Exception as e:
+            self._report_timed('transaction', 'run_transaction', start_perf_counter, e)
+            request_log.error('Failed to run transaction: %s', e)
+            return
+        latency_ms = self._report_timed('transaction', 'run_transaction', start_perf_counter)
+        request_log.info('Committed transaction of %s rows into table %s after %s retries. Latency: %d ms', workload_config.batch_size, table_name, retries, latency_ms)
+
+    @task(1)
+    def change_app(self):
+        # If only one database, this is a no-op
+        if (self.conn is not None and workload_config.num_databases == 1):
+            return
+
+        # Change the tenant app
+        self._release_connection()
+
+        dbname = workload_config.cluster_helper.get_random_db_name(workload_config.num_databases)
+        self.conn, latency_ms = self.connect_timer.get_connection(dbname)
+
+        # Reuse a single cursor (and its cached timing wrappers) until the connection changes
+        self.curs = self.conn.cursor()
+        self.batch_insert_timer.rebind(self.curs)
+        connect_log.info('Connected to database %s. Latency: %d', dbname, latency_ms)
+
+    def on_start(self):
+        self.change_app()
+
+    def _release_connection(self):
+        if (self.curs is not None):
+            self.curs.close()
+            self.curs = None
+        if (self.conn is not None):
+            workload_config.cluster_helper.ybconnection.release_connection(self.conn)
+            self.conn = None
+
+    def on_stop(self):
+        self._release_connection()
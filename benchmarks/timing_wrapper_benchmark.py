@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+from locust import User
+from locust.env import Environment
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.timing_wrapper import TimingWrapper
+
+""" Microbenchmark of the per-call overhead added by TimingWrapper
+    Usage: python3 benchmarks/timing_wrapper_benchmark.py --calls 1000000
+"""
+class _NoopUser(User):
+    pass
+
+class _Stub:
+    def execute(self, sql, params = None):
+        return None
+
+class _PerCallTimingWrapper:
+    # The original wrapper, which resolved the method, built a closure and a request dict on every call
+    def __init__(self, environment, stub, request_type = None):
+        self.env = environment
+        self._stub_class = stub.__class__
+        self._stub = stub
+        self._request_type = request_type
+
+    def __getattr__(self, name):
+        func = self._stub_class.__getattribute__(self._stub, name)
+
+        def wrapper(*args, **kwargs):
+            request_meta = {
+                "request_type": self._request_type,
+                "name": name,
+                "start_time": time.time(),
+                "response_length": 0,
+                "exception": None,
+                "context": None,
+                "response": None,
+            }
+            start_perf_counter = time.perf_counter()
+            ret = func(*args, **kwargs)
+            request_meta["response_time"] = (time.perf_counter() - start_perf_counter) * 1000
+            self.env.events.request.fire(**request_meta)
+            return ret, request_meta["response_time"]
+        return wrapper
+
+def _measure(description, calls, func, baseline_ns = 0):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    per_call_ns = (time.perf_counter() - start) / calls * 1e9
+    print(f'{description:<45} {per_call_ns:>10.0f} ns/call {per_call_ns - baseline_ns:>10.0f} ns overhead')
+    return per_call_ns
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--calls', default=200000, type=int,
+                        help="Number of calls per measurement")
+    parser.add_argument('--sample_rate', default=100, type=int,
+                        help="Sample rate used for the sampled measurement")
+    args = parser.parse_args()
+
+    env = Environment(user_classes=[_NoopUser])
+    env.create_local_runner()
+    stub = _Stub()
+
+    baseline = _measure('Direct call', args.calls, lambda: stub.execute('SELECT 1'))
+    _measure('Per-call wrapper (original)', args.calls, lambda: _PerCallTimingWrapper(env, stub, 'select').execute('SELECT 1'), baseline)
+
+    TimingWrapper.configure(1)
+    cached = TimingWrapper(env, stub, 'select')
+    _measure('Cached wrapper', args.calls, lambda: cached.execute('SELECT 1'), baseline)
+
+    TimingWrapper.configure(args.sample_rate)
+    sampled = TimingWrapper(env, stub, 'select')
+    _measure(f'Cached wrapper, events sampled 1/{args.sample_rate}', args.calls, lambda: sampled.execute('SELECT 1'), baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import time
+from locust import constant
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.cluster_helper import ClusterHelper
+from common.event_log import configure_logging
+from common.executor import Executor
+from common.self_monitor import SATURATED_REQUEST_TYPE
+from common.simulated_backend import LatencyModel, SimulatedYBConnection
+from select_workload import SelectWorkload
+from simple_workload import SimpleWorkload
+from idle_connections_workload import IdleConnectionsWorkload
+from simple_workload_sequential_access import SimpleWorkloadSequentialAccess
+
+""" Benchmark of the runner itself against the simulated backend, so no cluster is needed
+    Runs each workload without think time at increasing user counts and reports the requests/sec achieved per core
+    (requests per CPU second of this process) and the measurement overhead: how much the reported average latency
+    exceeds the simulated statement latency.
+    Usage: python3 benchmarks/workload_benchmark.py --users 10 100 1000 --duration 10 --latency_ms 1
+"""
+WORKLOADS = {'simple': SimpleWorkload, 'select': SelectWorkload, 'simple_sequential': SimpleWorkloadSequentialAccess,
+             'idle_connections': IdleConnectionsWorkload}
+
+def _run(workload, num_users, args):
+    ybconnection = SimulatedYBConnection(args.num_databases, args.num_tables, LatencyModel(args.latency_ms, args.latency_distribution),
+                                         LatencyModel(args.connect_latency_ms, args.latency_distribution), args.error_rate)
+    executor = Executor(ClusterHelper(ybconnection, 'yugabyte'), [workload], None)
+
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    executor.execute(num_users, num_users, args.duration)
+    wall = time.perf_counter() - start_wall
+    cpu = time.process_time() - start_cpu
+
+    # Saturation reports aren't requests; connects are, but only statements take the simulated statement latency
+    entries = [entry for entry in executor.env.stats.entries.values() if entry.method != SATURATED_REQUEST_TYPE]
+    num_requests = sum(entry.num_requests for entry in entries)
+    num_failures = sum(entry.num_failures for entry in entries)
+    statements = [entry for entry in entries if entry.method not in ('connect', 'idle_connection')]
+    num_statements = sum(entry.num_requests for entry in statements)
+    statement_ms = sum(entry.total_response_time for entry in statements) / num_statements if num_statements else 0
+    overhead = f'{statement_ms - args.latency_ms:>10.3f} ms' if num_statements else f'{"n/a":>13}'
+    print(f'{workload.__name__:<32} {num_users:>7} users {num_requests / wall:>10.0f} req/s {num_requests / max(cpu, 1e-9):>10.0f} req/s per core '
+          f'{num_failures:>7} failures {overhead} overhead')
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--workloads', default=list(WORKLOADS.keys()), nargs='+', choices=WORKLOADS.keys(),
+                        help="Workloads to benchmark")
+    parser.add_argument('--users', default=[10, 100, 1000], nargs='+', type=int,
+                        help="User counts to run each workload at")
+    parser.add_argument('--duration', default=10, type=int,
+                        help="Seconds per run (users are all spawned in the first second)")
+    parser.add_argument('--latency_ms', default=1, type=float,
+                        help="Mean simulated statement latency")
+    parser.add_argument('--latency_distribution', default='fixed', choices=LatencyModel.DISTRIBUTIONS,
+                        help="Distribution of simulated statement and connect latencies")
+    parser.add_argument('--connect_latency_ms', default=5, type=float,
+                        help="Mean simulated connect latency")
+    parser.add_argument('--error_rate', default=0, type=float,
+                        help="Fraction of simulated statements that fail")
+    parser.add_argument('--num_databases', default=10, type=int,
+                        help="Number of simulated databases")
+    parser.add_argument('--num_tables', default=100, type=int,
+                        help="Number of simulated tables per database")
+    args = parser.parse_args()
+
+    # Keep the console for results; workload logging would otherwise dominate the measurement
+    configure_logging('ERROR')
+
+    for name in args.workloads:
+        workload = WORKLOADS[name]
+        # Run flat out so that throughput is bounded by the runner and the simulated latency, not by think time
+        workload.wait_time = constant(0)
+        for num_users in args.users:
+            _run(workload, num_users, args)
+
+if __name__ == "__main__":
+    main()
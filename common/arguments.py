@@ -0,0 +1,57 @@
+from functools import partial
+from .event_log import EVENT_LOGGERS, parse_event_levels
+from .payload import PayloadGenerator
+from .distributions import DISTRIBUTIONS, create_distribution
+
+""" Command line arguments shared by workload_runner.py and async_workload_runner.py, so the two entry points stay in sync.
+    Must not import locust, which the asyncio entry point can't load.
+"""
+def add_logging_arguments(parser):
+    parser.add_argument('--log_level', default='INFO',
+                        type=str.upper,
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="Log level")
+    parser.add_argument('--log_event_levels', default=None,
+                        type=parse_event_levels,
+                        help="Comma separated event_type=LEVEL overrides, event types: " + ", ".join(EVENT_LOGGERS.keys()) + " (e.g. request=WARNING)")
+    parser.add_argument('--log_sample_rate', default=1,
+                        type=int,
+                        help="Log 1 in this many workload events below WARNING")
+    parser.add_argument('--log_buffered', action='store_true',
+                        help="Format and write log lines on a background thread")
+
+def add_payload_arguments(parser):
+    parser.add_argument('--payload_v1_size', default=40,
+                        type=int,
+                        help="Length of the generated v1 string")
+    parser.add_argument('--payload_v3_size', default=100,
+                        type=int,
+                        help="Length of the generated v3 string")
+    parser.add_argument('--payload_size_distribution', default='fixed',
+                        choices=PayloadGenerator.SIZE_DISTRIBUTIONS,
+                        help="Use the payload sizes as is, or pick lengths uniformly between half and 1.5 times the size")
+
+def create_payload(args):
+    return PayloadGenerator(args.payload_v1_size, args.payload_v3_size, args.payload_size_distribution)
+
+def add_distribution_arguments(parser):
+    parser.add_argument('--table_distribution', default='uniform',
+                        choices=DISTRIBUTIONS,
+                        help="How random tables are picked")
+    parser.add_argument('--db_distribution', default='uniform',
+                        choices=DISTRIBUTIONS,
+                        help="How random databases are picked when changing apps")
+    parser.add_argument('--zipfian_theta', default=0.99,
+                        type=float,
+                        help="Skew of the zipfian and latest distributions")
+    parser.add_argument('--hotspot_fraction', default=0.2,
+                        type=float,
+                        help="Fraction of ids that are hot in the hotspot distribution")
+    parser.add_argument('--hotspot_access', default=0.8,
+                        type=float,
+                        help="Fraction of accesses that go to hot ids in the hotspot distribution")
+
+def set_access_distributions(cluster_helper, args):
+    def factory(name):
+        return partial(create_distribution, name, theta=args.zipfian_theta, hot_fraction=args.hotspot_fraction, hot_access=args.hotspot_access)
+    cluster_helper.set_access_distributions(factory(args.table_distribution), factory(args.db_distribution))
@@ -0,0 +1,96 @@
+import logging
+import math
+import time
+import gevent
+import gevent.local
+from gevent.queue import Queue, Full
+
+""" Open-loop load: requests are released at a fixed (optionally ramped) arrival rate regardless of how fast
+    earlier requests complete. Users act as a pool of workers that pick up scheduled request slots.
+    Latency is measured from each slot's intended start time, so time spent waiting for a free user
+    (the queueing delay a real client would see) is part of the reported latency.
+"""
+class ArrivalScheduler:
+    def __init__(self, environment, target_rps, ramp_time = 0, max_backlog = None, late_threshold_ms = 10):
+        """Initialize arrival scheduler
+
+        Args:
+            environment (Environment): Locust environment to report late and dropped requests to
+            target_rps (float): Target arrival rate in requests / sec
+            ramp_time (int, optional): Seconds to ramp linearly from 0 to target_rps. Defaults to 0.
+            max_backlog (int, optional): Maximum scheduled requests waiting for a free user before new ones are dropped.
+                Defaults to one second worth of requests.
+            late_threshold_ms (int, optional): Requests picked up later than this after their intended start are counted as late. Defaults to 10.
+        """
+        self.env = environment
+        self.target_rps = target_rps
+        self.ramp_time = ramp_time
+        self.late_threshold_ms = late_threshold_ms
+        self.slots = Queue(max(int(max_backlog if max_backlog is not None else math.ceil(target_rps)), 1))
+        self.num_scheduled = 0
+        self.num_late = 0
+        self.num_dropped = 0
+        # Largest delay between a request's intended start and its release since the last take_max_release_delay()
+        self._max_release_delay_ms = 0
+        self._local = gevent.local.local()
+        self._producer = None
+
+    def _slot_offset(self, n):
+        # Seconds from the start at which the nth request is due, inverting the cumulative arrival count
+        ramp_requests = self.target_rps * self.ramp_time / 2
+        if (n <= ramp_requests):
+            return math.sqrt(2 * n * self.ramp_time / self.target_rps)
+        return self.ramp_time + (n - ramp_requests) / self.target_rps
+
+    def _produce(self):
+        start = time.perf_counter()
+        n = 0
+        while True:
+            n += 1
+            intended_start = start + self._slot_offset(n)
+            delay = intended_start - time.perf_counter()
+            if (delay > 0):
+                gevent.sleep(delay)
+            release_delay_ms = (time.perf_counter() - intended_start) * 1000
+            if (release_delay_ms > self._max_release_delay_ms):
+                self._max_release_delay_ms = release_delay_ms
+            self.num_scheduled += 1
+            try:
+                self.slots.put_nowait(intended_start)
+            except Full:
+                self.num_dropped += 1
+                self.env.events.request.fire(request_type='open_loop', name='dropped', start_time=time.time(), response_time=0,
+                    response_length=0, exception=Exception('No free user to run the request'), context=None, response=None)
+
+    def start(self):
+        logging.info(f'Scheduling requests at {self.target_rps} requests/sec' + (f' after a {self.ramp_time} sec ramp' if self.ramp_time else ''))
+        self._producer = gevent.spawn(self._produce)
+
+    def stop(self):
+        if (self._producer is not None):
+            self._producer.kill()
+            self._producer = None
+        logging.info(f'Open loop summary: {self.num_scheduled} scheduled, {self.num_late} late (> {self.late_threshold_ms} ms), {self.num_dropped} dropped')
+
+    def wait_time(self):
+        """Used as the users' wait_time (already bound, so locust calls it without the user): blocks until the next request slot and returns 0 so the task runs right away"""
+        intended_start = self.slots.get()
+        lateness_ms = (time.perf_counter() - intended_start) * 1000
+        if (lateness_ms > self.late_threshold_ms):
+            self.num_late += 1
+            self.env.events.request.fire(request_type='open_loop', name='late', start_time=time.time(), response_time=lateness_ms,
+                response_length=0, exception=None, context=None, response=None)
+        self._local.intended_start = intended_start
+        return 0
+
+    def take_max_release_delay(self):
+        """Returns the largest delay (ms) in releasing a request slot since the last call, which grows when the load generator falls behind"""
+        release_delay_ms = self._max_release_delay_ms
+        self._max_release_delay_ms = 0
+        return release_delay_ms
+
+    def take_intended_start(self):
+        """Returns the intended start (perf_counter) of the current user's request slot, once per slot"""
+        intended_start = getattr(self._local, 'intended_start', None)
+        self._local.intended_start = None
+        return intended_start
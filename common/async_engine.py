@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import random
+import time
+from .async_stats import RequestStats, StatsCSVFileWriter
+from .workload_config import workload_config
+from .payload import PayloadGenerator
+from .event_log import request_log
+from .schema_manifest import SchemaManifest
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+""" Asyncio execution engine
+    Runs workload sessions as coroutines on a single event loop using the asyncpg driver, as an alternative to
+    locust users on gevent. Sessions are scheduled like locust users: weighted tasks with a wait time in between.
+"""
+class AsyncUser:
+    # Task method names mapped to their weights
+    tasks = {}
+
+    # (min, max) seconds to wait between tasks, or None to not wait
+    wait_time = None
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    async def on_start(self):
+        pass
+
+    async def on_stop(self):
+        pass
+
+    async def timed(self, request_type, name, awaitable):
+        """Awaits awaitable and records its latency under request_type / name
+
+        Returns:
+            Tuple of the awaited result and the latency in ms
+        """
+        start_perf_counter = time.perf_counter()
+        try:
+            ret = await awaitable
+        except Exception as e:
+            self.executor.stats.log_request(request_type, name, (time.perf_counter() - start_perf_counter) * 1000, e)
+            raise
+        response_time = (time.perf_counter() - start_perf_counter) * 1000
+        self.executor.stats.log_request(request_type, name, response_time)
+        return ret, response_time
+
+    async def connect(self, dbname):
+        ybconnection = workload_config.cluster_helper.ybconnection
+        return await asyncpg.connect(host=ybconnection.host, port=int(ybconnection.port), user=ybconnection.dbuser,
+                                     password=ybconnection.dbpassword, database=dbname)
+
+class AsyncExecutor:
+    # Seconds between stats history rows and console summaries
+    HISTORY_INTERVAL = 1
+    SUMMARY_INTERVAL = 2
+
+    def __init__(self, cluster_helper, workload, csv_path, payload = None, schema_manifest = None):
+        if (asyncpg is None):
+            raise Exception('The asyncio engine requires the asyncpg package')
+
+        self.workload = workload
+        self.stats = RequestStats()
+        self.csv_writer = StatsCSVFileWriter(self.stats, csv_path) if csv_path is not None else None
+        self.num_users = 0
+        self._task_names = list(workload.tasks.keys())
+        self._task_weights = list(workload.tasks.values())
+
+        # Setup workload config
+        workload_config.cluster_helper = cluster_helper
+        workload_config.payload = payload if payload is not None else PayloadGenerator()
+        manifest = SchemaManifest.load_or_discover(cluster_helper, schema_manifest)
+        cluster_helper.use_manifest(manifest)
+        workload_config.num_databases = len(manifest.databases)
+        workload_config.num_tables = len(manifest.common_tables)
+
+        if (workload_config.num_databases < 1):
+            raise Exception(f'Invalid number of databases specified: {workload_config.num_databases}')
+
+        if (workload_config.num_tables < 1):
+            raise Exception(f'Invalid number of tables specified: {workload_config.num_tables}')
+
+        logging.info(f'Number of database: {workload_config.num_databases}, number of tables: {workload_config.num_tables}')
+
+    async def _run_user(self):
+        user = self.workload(self)
+        self.num_users += 1
+        try:
+            await user.on_start()
+            while True:
+                task = random.choices(self._task_names, self._task_weights)[0]
+                try:
+                    await getattr(user, task)()
+                except Exception as e:
+                    request_log.error('Task %s failed: %s', task, e)
+                if (user.wait_time is not None):
+                    await asyncio.sleep(random.uniform(*user.wait_time))
+        finally:
+            self.num_users -= 1
+            await user.on_stop()
+
+    async def _report_stats(self):
+        last_summary = time.monotonic()
+        while True:
+            await asyncio.sleep(self.HISTORY_INTERVAL)
+            if (self.csv_writer is not None):
+                self.csv_writer.write_history(self.num_users, self.HISTORY_INTERVAL)
+            if (time.monotonic() - last_summary >= self.SUMMARY_INTERVAL):
+                last_summary = time.monotonic()
+                self.stats.log_summary(self.num_users)
+
+    async def _run(self, num_users, spawn_rate, execution_time):
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + execution_time
+        reporter = asyncio.create_task(self._report_stats())
+        users = []
+        try:
+            # Spawn users at spawn_rate, then let them run until the execution time is up
+            for _ in range(num_users):
+                if (loop.time() >= end_time):
+                    break
+                users.append(asyncio.create_task(self._run_user()))
+                await asyncio.sleep(1 / spawn_rate)
+            await asyncio.sleep(max(end_time - loop.time(), 0))
+        finally:
+            for user in users:
+                user.cancel()
+            await asyncio.gather(*users, return_exceptions=True)
+            reporter.cancel()
+
+    def execute(self, num_users, spawn_rate, execution_time):
+        asyncio.run(self._run(num_users, spawn_rate, execution_time))
+        self.stats.log_summary(self.num_users)
+        if (self.csv_writer is not None):
+            self.csv_writer.write_stats()
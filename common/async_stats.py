@@ -0,0 +1,153 @@
+import csv
+import logging
+import time
+
+""" Request stats for the asyncio engine, written in the same CSV layout as the locust StatsCSVFileWriter
+    so that results of both engines can be compared side by side.
+    locust can't be imported here: it monkey-patches the standard library for gevent on import.
+"""
+PERCENTILES_TO_REPORT = [0.5, 0.75, 0.9, 0.95, 0.99]
+
+def _round_response_time(response_time):
+    # Same bucketing as locust: exact below 100 ms, then 2 significant digits
+    if (response_time < 100):
+        return round(response_time)
+    elif (response_time < 1000):
+        return round(response_time, -1)
+    elif (response_time < 10000):
+        return round(response_time, -2)
+    return round(response_time, -3)
+
+class StatsEntry:
+    def __init__(self, request_type, name):
+        self.request_type = request_type
+        self.name = name
+        self.num_requests = 0
+        self.num_failures = 0
+        self.total_response_time = 0
+        self.min_response_time = None
+        self.max_response_time = 0
+        self.response_times = {}
+        self.start_time = time.time()
+        self._interval_requests = 0
+        self._interval_failures = 0
+
+    def log(self, response_time):
+        self.num_requests += 1
+        self._interval_requests += 1
+        self.total_response_time += response_time
+        if (self.min_response_time is None or response_time < self.min_response_time):
+            self.min_response_time = response_time
+        if (response_time > self.max_response_time):
+            self.max_response_time = response_time
+        rounded = _round_response_time(response_time)
+        self.response_times[rounded] = self.response_times.get(rounded, 0) + 1
+
+    def log_error(self):
+        self.num_failures += 1
+        self._interval_failures += 1
+
+    def extend(self, other):
+        self.num_requests += other.num_requests
+        self.num_failures += other.num_failures
+        self._interval_requests += other._interval_requests
+        self._interval_failures += other._interval_failures
+        self.total_response_time += other.total_response_time
+        if (other.min_response_time is not None and (self.min_response_time is None or other.min_response_time < self.min_response_time)):
+            self.min_response_time = other.min_response_time
+        self.max_response_time = max(self.max_response_time, other.max_response_time)
+        self.start_time = min(self.start_time, other.start_time)
+        for response_time, count in other.response_times.items():
+            self.response_times[response_time] = self.response_times.get(response_time, 0) + count
+
+    def get_response_time_percentile(self, percentile):
+        if (not self.num_requests):
+            return 0
+        target = self.num_requests - int(self.num_requests * percentile)
+        processed = 0
+        for response_time in sorted(self.response_times, reverse=True):
+            processed += self.response_times[response_time]
+            if (processed >= target):
+                return response_time
+        return 0
+
+    @property
+    def avg_response_time(self):
+        return self.total_response_time / self.num_requests if self.num_requests else 0
+
+    def total_rps(self, now):
+        elapsed = now - self.start_time
+        return self.num_requests / elapsed if elapsed > 0 else 0
+
+    def take_interval(self):
+        # Returns and resets the request and failure counts since the last call
+        counts = (self._interval_requests, self._interval_failures)
+        self._interval_requests = 0
+        self._interval_failures = 0
+        return counts
+
+class RequestStats:
+    def __init__(self):
+        self.entries = {}
+
+    def log_request(self, request_type, name, response_time, exception = None):
+        entry = self.entries.get((name, request_type))
+        if (entry is None):
+            entry = self.entries[(name, request_type)] = StatsEntry(request_type, name)
+        # As in locust, failed requests count as requests as well as failures
+        entry.log(response_time)
+        if (exception is not None):
+            entry.log_error()
+
+    def aggregated(self):
+        total = StatsEntry('', 'Aggregated')
+        for entry in self.entries.values():
+            total.extend(entry)
+        return total
+
+    def log_summary(self, user_count):
+        total = self.aggregated()
+        logging.info(f'Users: {user_count}, requests: {total.num_requests}, failures: {total.num_failures}, '
+                     f'rps: {total.total_rps(time.time()):.1f}, avg: {total.avg_response_time:.1f} ms, '
+                     f'p99: {total.get_response_time_percentile(0.99)} ms')
+
+class StatsCSVFileWriter:
+    def __init__(self, stats, base_filepath, percentiles_to_report = PERCENTILES_TO_REPORT):
+        self.stats = stats
+        self.percentiles_to_report = percentiles_to_report
+        self.stats_filename = base_filepath + '_stats.csv'
+        self.history_filename = base_filepath + '_stats_history.csv'
+        self._percentile_headers = [f'{int(p * 100) if int(p * 100) == p * 100 else p * 100}%' for p in percentiles_to_report]
+        with open(self.history_filename, 'w', newline='') as f:
+            csv.writer(f).writerow(['Timestamp', 'User Count', 'Type', 'Name', 'Requests/s', 'Failures/s'] + self._percentile_headers +
+                ['Total Request Count', 'Total Failure Count', 'Total Median Response Time', 'Total Average Response Time',
+                 'Total Min Response Time', 'Total Max Response Time', 'Total Average Content Size'])
+
+    def _percentiles(self, entry):
+        return [entry.get_response_time_percentile(p) if entry.num_requests else 'N/A' for p in self.percentiles_to_report]
+
+    def write_history(self, user_count, interval):
+        # Append one row per entry, plus the aggregate, with the throughput of the last interval
+        now = time.time()
+        total = self.stats.aggregated()
+        rows = [(entry, entry.take_interval()) for entry in self.stats.entries.values()]
+        rows.append((total, (sum(counts[0] for _, counts in rows), sum(counts[1] for _, counts in rows))))
+        with open(self.history_filename, 'a', newline='') as f:
+            writer = csv.writer(f)
+            for entry, (requests, failures) in rows:
+                writer.writerow([int(now), user_count, entry.request_type, entry.name, f'{requests / interval:.6f}', f'{failures / interval:.6f}'] +
+                    self._percentiles(entry) + [entry.num_requests, entry.num_failures, entry.get_response_time_percentile(0.5),
+                    entry.avg_response_time, entry.min_response_time or 0, entry.max_response_time, 0])
+
+    def write_stats(self):
+        now = time.time()
+        entries = list(self.stats.entries.values()) + [self.stats.aggregated()]
+        with open(self.stats_filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Type', 'Name', 'Request Count', 'Failure Count', 'Median Response Time', 'Average Response Time',
+                'Min Response Time', 'Max Response Time', 'Average Content Size', 'Requests/s', 'Failures/s'] + self._percentile_headers)
+            for entry in entries:
+                elapsed = now - entry.start_time
+                writer.writerow([entry.request_type, entry.name, entry.num_requests, entry.num_failures,
+                    entry.get_response_time_percentile(0.5), entry.avg_response_time, entry.min_response_time or 0,
+                    entry.max_response_time, 0, entry.total_rps(now), entry.num_failures / elapsed if elapsed > 0 else 0] + self._percentiles(entry))
@@ -0,0 +1,149 @@
+import csv
+import logging
+import time
+from collections import Counter
+import gevent
+from .metrics_exporter import interval_percentiles
+from .self_monitor import SATURATED_REQUEST_TYPE
+
+""" Step-load search for the highest sustainable throughput
+    Users are increased in steps. Each stage is held, one measurement window at a time, until throughput and p99
+    latency change by less than the settle tolerance between consecutive windows (or the stage times out). The last
+    window of a stage is checked against the p99 latency and error rate SLOs; the search stops at the first stage that
+    breaches either one, and the stage before it is the capacity. A window in which no request completed (e.g. every
+    user is blocked on a stalled cluster) has no latency to check and counts as a breach.
+"""
+class _StageResult:
+    def __init__(self, stage, num_users, rps, p50, p99, error_rate, settled, duration):
+        self.stage = stage
+        self.num_users = num_users
+        self.rps = rps
+        self.p50 = p50
+        self.p99 = p99
+        self.error_rate = error_rate
+        self.settled = settled
+        self.duration = duration
+        self.passed = False
+
+class CapacitySearch:
+    # Seconds to wait for a stage's users to be spawned
+    SPAWN_TIMEOUT = 600
+
+    def __init__(self, env, start_users, step_users, max_users, spawn_rate, p99_slo_ms, error_rate_slo, result_path,
+                 window = 10, max_stage_time = 120, settle_tolerance = 0.05):
+        """Initialize capacity search
+
+        Args:
+            env (Environment): Locust environment to drive
+            start_users (int): Users in the first stage
+            step_users (int): Users added in each following stage
+            max_users (int): Users in the last stage
+            spawn_rate (float): Users spawned (or stopped) per second when changing stages
+            p99_slo_ms (float): Highest acceptable p99 latency in ms
+            error_rate_slo (float): Highest acceptable fraction of failed requests
+            result_path (str): CSV file to write per-stage results to
+            window (int, optional): Seconds per measurement window. Defaults to 10.
+            max_stage_time (int, optional): Seconds after which a stage that hasn't settled is measured anyway. Defaults to 120.
+            settle_tolerance (float, optional): Relative change in throughput and p99 between windows below which a stage has settled. Defaults to 0.05.
+        """
+        self.env = env
+        self.start_users = start_users
+        self.step_users = step_users
+        self.max_users = max_users
+        self.spawn_rate = spawn_rate
+        self.p99_slo_ms = p99_slo_ms
+        self.error_rate_slo = error_rate_slo
+        self.result_path = result_path
+        self.window = window
+        self.max_stage_time = max_stage_time
+        self.settle_tolerance = settle_tolerance
+        self.results = []
+
+    def _totals(self):
+        # Totals over the database requests, leaving out the load generator's own saturation reports
+        num_requests, num_failures, response_times = 0, 0, Counter()
+        for entry in self.env.stats.entries.values():
+            if (entry.method != SATURATED_REQUEST_TYPE):
+                num_requests += entry.num_requests
+                num_failures += entry.num_failures
+                response_times.update(entry.response_times)
+        return num_requests, num_failures, response_times
+
+    def _measure_window(self):
+        num_requests, num_failures, response_times = self._totals()
+        start = time.monotonic()
+        gevent.sleep(self.window)
+        elapsed = time.monotonic() - start
+
+        end_requests, end_failures, end_response_times = self._totals()
+        interval_requests = end_requests - num_requests
+        interval_failures = end_failures - num_failures
+        percentiles = interval_percentiles(end_response_times, response_times, [0.5, 0.99])
+        error_rate = interval_failures / interval_requests if interval_requests else 0
+        return interval_requests / elapsed, percentiles.get(0.5, 0), percentiles.get(0.99, 0), error_rate
+
+    def _is_settled(self, previous, current):
+        def close(a, b):
+            return abs(a - b) <= self.settle_tolerance * max(a, b, 1e-9)
+        return close(previous[0], current[0]) and close(previous[2], current[2])
+
+    def _wait_for_spawn(self, num_users):
+        with gevent.Timeout(self.SPAWN_TIMEOUT, Exception(f'Timed out spawning {num_users} users')):
+            while (self.env.runner.user_count != num_users):
+                gevent.sleep(1)
+
+    def _run_stage(self, stage, num_users):
+        logging.info(f'Capacity stage {stage}: {num_users} users')
+        self.env.runner.start(num_users, spawn_rate=self.spawn_rate)
+        self._wait_for_spawn(num_users)
+
+        stage_start = time.monotonic()
+        previous = None
+        while True:
+            current = self._measure_window()
+            settled = previous is not None and self._is_settled(previous, current)
+            if (settled or time.monotonic() - stage_start >= self.max_stage_time):
+                break
+            previous = current
+
+        rps, p50, p99, error_rate = current
+        stalled = rps == 0
+        result = _StageResult(stage, num_users, rps, p50, p99, error_rate, settled, time.monotonic() - stage_start)
+        result.passed = not stalled and p99 <= self.p99_slo_ms and error_rate <= self.error_rate_slo
+        logging.info(f'Capacity stage {stage}: {num_users} users, {rps:.1f} requests/sec, p50 {p50} ms, p99 {p99} ms, '
+                     f'error rate {error_rate:.2%}' + ('' if settled else ' (did not settle)') + (' (no requests completed)' if stalled else '')
+                     + (', within SLO' if result.passed else ', SLO breached'))
+        return result
+
+    def run(self):
+        num_users = self.start_users
+        stage = 1
+        try:
+            while (num_users <= self.max_users):
+                result = self._run_stage(stage, num_users)
+                self.results.append(result)
+                if (not result.passed):
+                    break
+                num_users += self.step_users
+                stage += 1
+        finally:
+            self.env.runner.quit()
+            self.env.runner.greenlet.join()
+            self._write_results()
+
+        passed = [result for result in self.results if result.passed]
+        if (not passed):
+            logging.warning(f'No stage met the SLO (p99 <= {self.p99_slo_ms} ms, error rate <= {self.error_rate_slo:.2%})')
+        else:
+            best = max(passed, key=lambda result: result.rps)
+            logging.info(f'Capacity: {best.rps:.1f} requests/sec with {best.num_users} users (p99 {best.p99} ms, error rate {best.error_rate:.2%})'
+                         + ('' if len(passed) < len(self.results) else f', SLO not breached up to {self.max_users} users'))
+
+    def _write_results(self):
+        with open(self.result_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Stage', 'Users', 'Requests/s', '50%', '99%', 'Error Rate', 'Settled', 'Duration', 'Within SLO'])
+            for result in self.results:
+                writer.writerow([result.stage, result.num_users, f'{result.rps:.2f}', result.p50, result.p99, f'{result.error_rate:.4f}',
+                                 result.settled, f'{result.duration:.0f}', result.passed])
+        logging.info(f'Wrote capacity search results to {self.result_path}')
@@ -1,13 +1,48 @@
 import logging
 import random
+import psycopg2
+import psycopg2.errors
+from .parallel import ProgressReporter, retry, run_in_parallel
 
 class ClusterHelper:
     DB_NAME_PREFIX = 'md_scalability_db_'
     TABLE_NAME_PREFIX = 'md_scalability_table_'
+    # Objects created and dropped by the ddl_churn workload
+    CHURN_DB_NAME_PREFIX = 'md_churn_db_'
+    CHURN_TABLE_NAME_PREFIX = 'md_churn_table_'
+    DEFAULT_PARALLELISM = 16
+    DEFAULT_DDL_BATCH_SIZE = 50
+    DROP_ATTEMPTS = 5
 
     def __init__(self, ybconnection, init_dbname):
         self.ybconnection = ybconnection
         self.init_dbname = init_dbname
+        self.table_distribution_factory = None
+        self.db_distribution_factory = None
+        self._distributions = {}
+        # Precomputed names indexed by id - 1, set from a schema manifest
+        self.db_names = None
+        self.table_names = None
+
+    def set_access_distributions(self, table_distribution_factory, db_distribution_factory):
+        """Sets how random tables and databases are picked
+
+        Args:
+            table_distribution_factory (callable): Creates a distribution given the number of tables, or None for uniform
+            db_distribution_factory (callable): Creates a distribution given the number of databases, or None for uniform
+        """
+        self.table_distribution_factory = table_distribution_factory
+        self.db_distribution_factory = db_distribution_factory
+        self._distributions = {}
+
+    # Picks an id in [1, n] with the given distribution, built once per range since some precompute tables
+    def _sample(self, factory, n):
+        if (factory is None):
+            return random.randrange(1, n + 1)
+        distribution = self._distributions.get((factory, n))
+        if (distribution is None):
+            distribution = self._distributions[(factory, n)] = factory(n)
+        return distribution.sample()
 
     # Constructs a db name given an id
     def get_db_name(self, id):
@@ -17,95 +52,183 @@ class ClusterHelper:
     def get_table_name(self, id):
         return self.TABLE_NAME_PREFIX + str(id)
 
-    # Constructs a random table name given table count
+    def use_manifest(self, manifest):
+        """Picks names from the databases and tables (common to every database) in a schema manifest instead of building them"""
+        self.db_names = manifest.databases
+        self.table_names = manifest.common_tables
+
+    # Returns the name of the table at position (1 based) in the manifest, or constructs it from the id without one
+    def get_table_name_at(self, position):
+        return self.table_names[position - 1] if self.table_names is not None else self.get_table_name(position)
+
+    # Picks a random table name given table count
     def get_random_table_name(self, num_tables):
-        return self.get_table_name(random.randrange(1, num_tables + 1))
+        return self.get_table_name_at(self._sample(self.table_distribution_factory, num_tables))
 
-    # Constructs a random db name given table count
+    # Returns the name of the database at position (1 based) in the manifest, or constructs it from the id without one
+    def get_db_name_at(self, position):
+        return self.db_names[position - 1] if self.db_names is not None else self.get_db_name(position)
+
+    # Picks a random db name given db count
     def get_random_db_name(self, num_dbs):
-        return self.get_db_name(random.randrange(1, num_dbs + 1))
+        return self.get_db_name_at(self._sample(self.db_distribution_factory, num_dbs))
 
-    def _create_databases(self, ysql_session, num_databases):
-        for x in range(1, num_databases + 1):
-            name = self.get_db_name(x)
-            try:
-                with ysql_session.cursor() as curs:
-                    curs.execute(f"SELECT 1 FROM pg_catalog.pg_database WHERE datname = '{name}'")
-                    exists = curs.fetchone()
-                    if not exists:
-                        curs.execute(f'CREATE DATABASE {name} WITH colocated = true')
-                        logging.info(f'Created database {name}')
-                    else:
-                        logging.info(f'Skipping creation of database {name} because it already exists')
-            except Exception as e:
-                raise Exception(f'Error creating database: {e}') from e
-
-    def _create_database_objects(self, ysql_session, dbname, num_tables):
-        for x in range(1, num_tables + 1):
-            table_name = self.get_table_name(x)
+    # Returns the names of all existing scalability databases, using a single catalog lookup
+    def _get_existing_databases(self, ysql_session):
+        with ysql_session.cursor() as curs:
+            curs.execute(f"SELECT datname FROM pg_catalog.pg_database WHERE datname ~ '^{self.DB_NAME_PREFIX}[0-9]+$'")
+            return set(row[0] for row in curs.fetchall())
+
+    # Returns the names of databases left behind by the ddl_churn workload
+    def _get_churn_databases(self, ysql_session):
+        with ysql_session.cursor() as curs:
+            curs.execute(f"SELECT datname FROM pg_catalog.pg_database WHERE datname ~ '^{self.CHURN_DB_NAME_PREFIX}[0-9_]+$'")
+            return set(row[0] for row in curs.fetchall())
+
+    # Returns the names of all existing scalability tables in the database the session is connected to
+    def _get_existing_tables(self, ysql_session):
+        with ysql_session.cursor() as curs:
+            curs.execute(f"SELECT tablename FROM pg_catalog.pg_tables WHERE schemaname = 'public' AND tablename ~ '^{self.TABLE_NAME_PREFIX}[0-9]+$'")
+            return set(row[0] for row in curs.fetchall())
+
+    def _create_databases(self, dbnames, parallelism, progress):
+        def worker(names):
+            conn = self.ybconnection.connect_to_ysql(self.init_dbname)
             try:
-                with ysql_session.cursor() as curs:
-                    curs.execute(f'CREATE TABLE IF NOT EXISTS {table_name} (k SERIAL PRIMARY KEY, v1 VARCHAR, v2 INT, v3 TEXT, v4 SERIAL UNIQUE)')
-                    logging.info(f'Created table {table_name} on database {dbname}')
-            except Exception as e:
-                raise Exception(f'Error creating table: {e}') from e
+                for name in names:
+                    try:
+                        with conn.cursor() as curs:
+                            curs.execute(f'CREATE DATABASE {name} WITH colocated = true')
+                    except Exception as e:
+                        raise Exception(f'Error creating database {name}: {e}') from e
+                    progress.add()
+            finally:
+                conn.close()
+
+        run_in_parallel(dbnames, worker, parallelism)
+
+    def _create_database_objects(self, dbnames, num_tables, parallelism, ddl_batch_size, progress):
+        def worker(names):
+            for dbname in names:
+                conn = self.ybconnection.connect_to_ysql(dbname)
+                try:
+                    existing_tables = self._get_existing_tables(conn)
+                    table_names = [self.get_table_name(x) for x in range(1, num_tables + 1)]
+                    # Tables beyond num_tables (from an earlier, larger setup) aren't part of this setup's progress
+                    progress.add(sum(1 for table_name in table_names if table_name in existing_tables))
+                    statements = [f'CREATE TABLE IF NOT EXISTS {table_name} (k SERIAL PRIMARY KEY, v1 VARCHAR, v2 INT, v3 TEXT, v4 SERIAL UNIQUE)'
+                        for table_name in table_names if table_name not in existing_tables]
+
+                    # Send each batch of DDL as a single multi-statement transaction to save round trips
+                    for i in range(0, len(statements), ddl_batch_size):
+                        batch = statements[i:i + ddl_batch_size]
+                        try:
+                            with conn.cursor() as curs:
+                                curs.execute('BEGIN; ' + '; '.join(batch) + '; COMMIT')
+                        except Exception as e:
+                            raise Exception(f'Error creating tables on database {dbname}: {e}') from e
+                        progress.add(len(batch))
+                finally:
+                    conn.close()
+
+        run_in_parallel(dbnames, worker, parallelism)
+
+    def setup_cluster(self, num_databases, num_tables, parallelism = DEFAULT_PARALLELISM, ddl_batch_size = DEFAULT_DDL_BATCH_SIZE):
+        self.ybconnection.enable_cooperative_wait()
+        dbnames = [self.get_db_name(x) for x in range(1, num_databases + 1)]
 
-    def setup_cluster(self, num_databases, num_tables):
         # Create databases
         default_conn = self.ybconnection.connect_to_ysql(self.init_dbname)
         try:
-            self._create_databases(default_conn, num_databases)
+            existing_dbs = self._get_existing_databases(default_conn)
         finally:
             default_conn.close()
-            
+
+        missing_dbs = [name for name in dbnames if name not in existing_dbs]
+        logging.info(f'Creating {len(missing_dbs)} databases, skipping {num_databases - len(missing_dbs)} that already exist')
+        progress = ProgressReporter('Creating databases', len(missing_dbs), 'databases')
+        self._create_databases(missing_dbs, parallelism, progress)
+        progress.finish()
+
         # Create database objects
-        for x in range(1, num_databases + 1):
-            dbname = self.get_db_name(x)
-            conn = self.ybconnection.connect_to_ysql(dbname)
+        progress = ProgressReporter('Creating tables', num_databases * num_tables, 'tables')
+        self._create_database_objects(dbnames, num_tables, parallelism, ddl_batch_size, progress)
+        progress.finish()
+
+    def _drop_databases(self, dbnames, parallelism, progress):
+        def worker(names):
+            conn = None
             try:
-                self._create_database_objects(conn, dbname, num_tables)
+                for name in names:
+                    def drop():
+                        nonlocal conn
+                        # Reconnect if a transient error broke the connection
+                        if (conn is None or conn.closed):
+                            conn = self.ybconnection.connect_to_ysql(self.init_dbname)
+                        with conn.cursor() as curs:
+                            curs.execute(f'DROP DATABASE IF EXISTS {name}')
+                    try:
+                        retry(drop, attempts=self.DROP_ATTEMPTS, retryable=(psycopg2.OperationalError, psycopg2.errors.SerializationFailure),
+                              description=f'Dropping database {name}')
+                    except Exception as e:
+                        raise Exception(f'Error dropping database {name}: {e}') from e
+                    progress.add()
             finally:
-                conn.close()
+                if (conn is not None):
+                    conn.close()
+
+        run_in_parallel(dbnames, worker, parallelism)
 
-    def clean_cluster(self):
-        # Drop until we exhaust the number of databases
+    def clean_cluster(self, parallelism = DEFAULT_PARALLELISM):
+        self.ybconnection.enable_cooperative_wait()
+
+        # Discover every scalability database, including any left behind after gaps in the numbering
         conn = self.ybconnection.connect_to_ysql(self.init_dbname)
-        db_num = 1
         try:
-            while(True):
-                dbname = self.get_db_name(db_num)
-                try:
-                    with conn.cursor() as curs:
-                        curs.execute(f'DROP DATABASE {dbname}')
-                        logging.info(f'Dropped database {dbname}')
-                except Exception as e:
-                    break
-                db_num = db_num + 1
+            dbnames = sorted(self._get_existing_databases(conn)) + sorted(self._get_churn_databases(conn))
         finally:
             conn.close()
 
-    def get_num_databases(self):
+        logging.info(f'Dropping {len(dbnames)} databases')
+        progress = ProgressReporter('Dropping databases', len(dbnames), 'databases')
+        self._drop_databases(dbnames, parallelism, progress)
+        progress.finish()
+
+    # Returns the names of all scalability databases
+    def list_databases(self):
         conn = self.ybconnection.connect_to_ysql(self.init_dbname)
         try:
-            with conn.cursor() as curs:
-                curs.execute(f"SELECT COUNT(*) FROM pg_catalog.pg_database WHERE datname LIKE '{self.DB_NAME_PREFIX}%'")
-                result = curs.fetchone()
-                if (result):
-                    return result[0]
-                else:
-                    return 0
+            return sorted(self._get_existing_databases(conn), key=lambda name: int(name[len(self.DB_NAME_PREFIX):]))
         finally:
             conn.close()
 
-    def get_num_tables(self, dbname):
+    # Returns the names of all scalability tables in a database
+    def list_tables(self, dbname):
         conn = self.ybconnection.connect_to_ysql(dbname)
+        try:
+            return sorted(self._get_existing_tables(conn), key=lambda name: int(name[len(self.TABLE_NAME_PREFIX):]))
+        finally:
+            conn.close()
+
+    # Returns the names of all scalability tables in each of the given databases, looking databases up in parallel
+    # since every database needs its own connection. The lookups only overlap once the caller has enabled cooperative waits.
+    def list_tables_by_database(self, dbnames, parallelism = DEFAULT_PARALLELISM):
+        tables = {}
+        def worker(names):
+            for dbname in names:
+                tables[dbname] = self.list_tables(dbname)
+        run_in_parallel(dbnames, worker, parallelism)
+        return tables
+
+    # Returns the catalog versions (bumped by DDL) as sorted [database oid, version] pairs, or None if the server doesn't report them.
+    # With per database catalog versions each database has its own, so a DDL may not change the highest one.
+    def get_catalog_versions(self):
+        conn = self.ybconnection.connect_to_ysql(self.init_dbname)
         try:
             with conn.cursor() as curs:
-                curs.execute(f"SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE table_name LIKE '{self.TABLE_NAME_PREFIX}%'")
-                result = curs.fetchone()
-                if (result):
-                    return result[0]
-                else:
-                    return 0
+                curs.execute('SELECT db_oid, current_version FROM pg_yb_catalog_version ORDER BY db_oid')
+                return [[db_oid, version] for db_oid, version in curs.fetchall()]
+        except psycopg2.errors.UndefinedTable:
+            return None
         finally:
             conn.close()
@@ -0,0 +1,98 @@
+import csv
+import logging
+import time
+import gevent
+import psycopg2.errors
+
+""" Samples backend memory per connection over time from pg_stat_activity on every node of the cluster.
+    pg_stat_activity only lists the backends of the node it is queried on, so each node is sampled over its own
+    connection, which leaves itself out. YugabyteDB reports allocated_mem_bytes and rss_mem_bytes per backend;
+    on servers without these columns only the connection count is sampled.
+"""
+class ConnectionMemorySampler:
+    MEMORY_QUERY = ("SELECT count(*), avg(allocated_mem_bytes), avg(rss_mem_bytes) FROM pg_stat_activity "
+                    "WHERE backend_type = 'client backend' AND pid <> pg_backend_pid()")
+    COUNT_QUERY = "SELECT count(*), NULL, NULL FROM pg_stat_activity WHERE backend_type = 'client backend' AND pid <> pg_backend_pid()"
+
+    def __init__(self, ybconnection, dbname, interval = 5, csv_path = None):
+        """Initialize connection memory sampler
+
+        Args:
+            ybconnection (YBConnection): Connection object whose nodes are sampled
+            dbname (str): Database to connect to
+            interval (int, optional): Seconds between samples. Defaults to 5.
+            csv_path (str, optional): CSV file to write per node samples to. Defaults to None to only log them.
+        """
+        self.ybconnection = ybconnection
+        self.dbname = dbname
+        self.interval = interval
+        self.csv_path = csv_path
+        self._query = self.MEMORY_QUERY
+        # Sampling connection to each node, by node
+        self._conns = {}
+        self._file = None
+        self._writer = None
+        self._greenlet = None
+
+    def start(self):
+        for node in self.ybconnection.nodes:
+            try:
+                self._conns[node] = self.ybconnection.connect_to_node(self.dbname, node)
+            except Exception as e:
+                logging.warning(f'Not sampling connection memory on node {node}: {e}')
+        if (self.csv_path is not None):
+            self._file = open(self.csv_path, 'w', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['Timestamp', 'Node', 'Connections', 'Avg Allocated Bytes', 'Avg RSS Bytes'])
+        self._greenlet = gevent.spawn(self._run)
+
+    def stop(self):
+        if (self._greenlet is not None):
+            self._greenlet.kill()
+            self._greenlet = None
+        if (self._file is not None):
+            self._file.close()
+            self._file = None
+        for conn in self._conns.values():
+            conn.close()
+        self._conns = {}
+
+    def sample(self, node):
+        """Returns the number of client connections on a node and their average allocated and RSS memory in bytes (None if not reported)"""
+        try:
+            with self._conns[node].cursor() as curs:
+                curs.execute(self._query)
+                return curs.fetchone()
+        except psycopg2.errors.UndefinedColumn:
+            logging.warning('Server does not report memory per connection, sampling connection counts only')
+            self._query = self.COUNT_QUERY
+            return self.sample(node)
+
+    def _run(self):
+        while True:
+            timestamp = int(time.time())
+            total_connections = 0
+            total_allocated_bytes = 0
+            total_rss_bytes = 0
+            for node in self._conns:
+                try:
+                    num_connections, allocated_bytes, rss_bytes = self.sample(node)
+                except Exception as e:
+                    logging.error(f'Failed to sample connection memory on node {node}: {e}')
+                    continue
+                total_connections += num_connections
+                if (allocated_bytes is not None):
+                    total_allocated_bytes += allocated_bytes * num_connections
+                    total_rss_bytes += rss_bytes * num_connections
+                if (self._writer is not None):
+                    self._writer.writerow([timestamp, node, num_connections, allocated_bytes, rss_bytes])
+            if (self._writer is not None):
+                self._file.flush()
+
+            # Averages over the connections of every node, weighted by each node's connection count
+            if (total_allocated_bytes and total_connections):
+                logging.info(f'Connections: {total_connections} on {len(self._conns)} nodes, average memory per connection: '
+                             f'allocated {total_allocated_bytes / total_connections / 2**20:.2f} MB, RSS {total_rss_bytes / total_connections / 2**20:.2f} MB')
+            else:
+                logging.info(f'Connections: {total_connections} on {len(self._conns)} nodes')
+            gevent.sleep(self.interval)
@@ -0,0 +1,162 @@
+import logging
+import time
+from collections import OrderedDict
+import gevent
+from gevent.lock import BoundedSemaphore
+import psycopg2.extensions
+
+""" Pools YSQL connections per database so that workloads can switch databases without reconnecting
+    Users hold their connection between tasks, so a database pool serves at most max_size users at a time; users
+    beyond that wait for a free connection for up to acquire_timeout secs, and that wait is part of the time to get
+    a connection.
+"""
+class PoolTimeout(Exception):
+    pass
+
+class _DatabasePool:
+    def __init__(self, dbname, max_size):
+        self.dbname = dbname
+        # Idle connections as (connection, time returned to the pool), most recently used last
+        self.idle = []
+        self.slots = BoundedSemaphore(max_size)
+        self.num_borrowed = 0
+        self.retired = False
+
+class ConnectionPool:
+    def __init__(self, connect, min_size = 0, max_size = 100, max_databases = 100, idle_timeout = 60, health_check_interval = 10,
+                 acquire_timeout = 30):
+        """Initialize connection pool
+
+        Args:
+            connect (callable): Opens a new connection given a database name
+            min_size (int, optional): Connections opened when a database pool is created and kept through idle eviction. Defaults to 0.
+            max_size (int, optional): Maximum connections (idle and borrowed) per database. Defaults to 100.
+            max_databases (int, optional): Maximum number of database pools; beyond this the least recently used pool without
+                borrowed connections is closed. Defaults to 100.
+            idle_timeout (int, optional): Seconds after which idle connections above min_size are closed. Defaults to 60.
+            health_check_interval (int, optional): Idle seconds after which a connection is validated before being handed out. Defaults to 10.
+            acquire_timeout (int, optional): Seconds to wait for a connection while the database pool is exhausted. Defaults to 30.
+        """
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_databases = max_databases
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        # Locust environment that acquire timeouts are reported to, set by the executor
+        self.environment = None
+        self._pools = OrderedDict()
+        self._borrowed = {}
+        self._reaper = gevent.spawn(self._reap_idle_connections)
+
+    def _get_pool(self, dbname):
+        pool = self._pools.get(dbname)
+        if (pool is not None):
+            self._pools.move_to_end(dbname)
+            return pool
+
+        pool = _DatabasePool(dbname, self.max_size)
+        self._pools[dbname] = pool
+        self._evict_pools()
+
+        for _ in range(self.min_size):
+            pool.idle.append((self._connect(dbname), time.monotonic()))
+        return pool
+
+    def _evict_pools(self):
+        # Pools with borrowed connections are kept: a new pool for their database would hand out another max_size
+        # connections while the borrowed ones still count against the database. Until enough pools are returned to,
+        # there can be more than max_databases pools.
+        while (len(self._pools) > self.max_databases):
+            # Oldest first, never the pool that was just created
+            lru_dbname = next((dbname for dbname, pool in list(self._pools.items())[:-1] if pool.num_borrowed == 0), None)
+            if (lru_dbname is None):
+                return
+            self._retire(self._pools.pop(lru_dbname))
+
+    def _retire(self, pool):
+        # Borrowed connections of a retired (closed) pool are closed when they are released
+        pool.retired = True
+        logging.info(f'Evicting connection pool for database {pool.dbname}')
+        while pool.idle:
+            conn, _ = pool.idle.pop()
+            self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logging.warning(f'Failed to close pooled connection: {e}')
+
+    def _is_healthy(self, conn, idle_since):
+        if (conn.closed):
+            return False
+        if (time.monotonic() - idle_since < self.health_check_interval):
+            return True
+        try:
+            with conn.cursor() as curs:
+                curs.execute('SELECT 1')
+            return True
+        except Exception as e:
+            logging.warning(f'Discarding unhealthy pooled connection: {e}')
+            return False
+
+    def acquire(self, dbname):
+        """Borrows a connection to dbname, waiting up to acquire_timeout while the database pool is exhausted"""
+        pool = self._get_pool(dbname)
+        start_perf_counter = time.perf_counter()
+        if (not pool.slots.acquire(timeout=self.acquire_timeout)):
+            error = PoolTimeout(f'Timed out after {self.acquire_timeout} secs waiting for one of {self.max_size} pooled connections to database {dbname}')
+            if (self.environment is not None):
+                self.environment.events.request.fire(request_type='connection_pool', name='acquire', start_time=time.time(),
+                    response_time=(time.perf_counter() - start_perf_counter) * 1000, response_length=0, exception=error, context=None, response=None)
+            raise error
+        try:
+            conn = None
+            while pool.idle and conn is None:
+                candidate, idle_since = pool.idle.pop()
+                if (self._is_healthy(candidate, idle_since)):
+                    conn = candidate
+                else:
+                    self._close(candidate)
+            if (conn is None):
+                conn = self._connect(dbname)
+        except Exception:
+            pool.slots.release()
+            raise
+        self._borrowed[conn] = pool
+        pool.num_borrowed += 1
+        return conn
+
+    def release(self, conn):
+        """Returns a borrowed connection to its pool"""
+        pool = self._borrowed.pop(conn)
+        pool.num_borrowed -= 1
+        pool.slots.release()
+
+        # Don't hand out connections that are broken or were left inside a transaction
+        if (pool.retired or conn.closed or conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+            self._close(conn)
+        else:
+            pool.idle.append((conn, time.monotonic()))
+
+    def close(self):
+        self._reaper.kill()
+        for pool in self._pools.values():
+            self._retire(pool)
+        self._pools.clear()
+
+    def _reap_idle_connections(self):
+        while True:
+            gevent.sleep(max(self.idle_timeout / 2, 1))
+            cutoff = time.monotonic() - self.idle_timeout
+            for pool in list(self._pools.values()):
+                # Idle connections are ordered by last use, so the oldest are at the front
+                num_expired = 0
+                while (num_expired < len(pool.idle) - self.min_size and pool.idle[num_expired][1] < cutoff):
+                    num_expired += 1
+                expired = pool.idle[:num_expired]
+                del pool.idle[:num_expired]
+                for conn, _ in expired:
+                    self._close(conn)
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from .parallel import ProgressReporter
+from .payload import PayloadGenerator
+from .schema_manifest import SchemaManifest
+
+""" Bulk loads the scalability tables by streaming generated rows through COPY FROM STDIN.
+    Loading is spread over worker processes, each taking a shard of the tables, since both row generation and
+    COPY are per-process work. The tables are discovered once, by the parent, and handed to the worker processes
+    through a schema manifest file. COPY needs the blocking psycopg2 wait mode, so loading must not enable
+    cooperative waits.
+"""
+class _RowStream:
+    def __init__(self, num_rows, payload):
+        """File-like object that generates COPY text rows for (v1, v2, v3) as they are read
+
+        Args:
+            num_rows (int): Number of rows to generate
+            payload (PayloadGenerator): Generator of row values
+        """
+        self.remaining = num_rows
+        self.payload = payload
+        self.bytes_read = 0
+
+    def read(self, size = 8192):
+        lines = []
+        length = 0
+        while (self.remaining > 0 and length < size):
+            v1, v2, v3 = self.payload.row()
+            line = f'{v1}\t{v2}\t{v3}\n'
+            lines.append(line)
+            length += len(line)
+            self.remaining -= 1
+        data = ''.join(lines).encode()
+        self.bytes_read += len(data)
+        return data
+
+class DataLoader:
+    DEFAULT_BATCH_ROWS = 10000
+
+    def __init__(self, cluster_helper, payload = None):
+        self.cluster_helper = cluster_helper
+        self.payload = payload if payload is not None else PayloadGenerator()
+        self.ybconnection = cluster_helper.ybconnection
+
+    def rows_for_size(self, mb_per_table):
+        # Sized by the generated COPY data, so it follows the payload sizes
+        return int(mb_per_table * 1024 * 1024 / self.payload.mean_row_bytes())
+
+    def _get_tables(self, manifest):
+        # Every (database, table) to load, in a stable order so that all processes agree on the shards
+        return [(dbname, table_name) for dbname in manifest.databases for table_name in manifest.tables[dbname]]
+
+    def _load_table(self, conn, table_name, rows_per_table, batch_rows, progress):
+        # Returns the rows and bytes actually inserted, which leave out rows the table already had
+        rows_inserted = 0
+        bytes_inserted = 0
+        with conn.cursor() as curs:
+            # Counting stops at the target, so tables that are already loaded aren't scanned in full
+            curs.execute(f'SELECT count(*) FROM (SELECT 1 FROM {table_name} LIMIT %s) AS existing', (rows_per_table,))
+            existing_rows = curs.fetchone()[0]
+            remaining = max(rows_per_table - existing_rows, 0)
+            progress.add(rows_per_table - remaining)
+
+            # Each batch is a separate COPY, so it commits on its own
+            while (remaining > 0):
+                batch = min(batch_rows, remaining)
+                stream = _RowStream(batch, self.payload)
+                curs.copy_expert(f'COPY {table_name} (v1, v2, v3) FROM STDIN', stream)
+                remaining -= batch
+                rows_inserted += batch
+                bytes_inserted += stream.bytes_read
+                progress.add(batch, stream.bytes_read)
+        return rows_inserted, bytes_inserted
+
+    def _load_shard(self, tables, rows_per_table, batch_rows, description):
+        # Returns the rows and bytes inserted into the shard's tables
+        progress = ProgressReporter(description, len(tables) * rows_per_table, 'rows')
+        rows_inserted = 0
+        bytes_inserted = 0
+        conn = None
+        conn_dbname = None
+        try:
+            for dbname, table_name in tables:
+                if (dbname != conn_dbname):
+                    if (conn is not None):
+                        conn.close()
+                    conn = self.ybconnection.connect_to_ysql(dbname)
+                    conn_dbname = dbname
+                try:
+                    rows, num_bytes = self._load_table(conn, table_name, rows_per_table, batch_rows, progress)
+                except Exception as e:
+                    raise Exception(f'Error loading table {table_name} on database {dbname}: {e}') from e
+                rows_inserted += rows
+                bytes_inserted += num_bytes
+        finally:
+            if (conn is not None):
+                conn.close()
+        progress.finish()
+        return rows_inserted, bytes_inserted
+
+    def _log_summary(self, rows_inserted, bytes_inserted, elapsed):
+        elapsed = max(elapsed, 1e-6)
+        logging.info(f'Inserted {rows_inserted} rows ({bytes_inserted / (1024 * 1024):.1f} MB) in {elapsed:.1f} secs '
+                     f'({rows_inserted / elapsed:.1f} rows/sec, {bytes_inserted / elapsed / (1024 * 1024):.1f} MB/sec)')
+
+    def _run_shards(self, processes, worker_args, schema_manifest):
+        # Each loader process writes the rows and bytes it inserted to its own result file
+        result_paths = []
+        for _ in range(processes):
+            fd, path = tempfile.mkstemp(prefix='load_shard_', suffix='.json')
+            os.close(fd)
+            result_paths.append(path)
+        try:
+            workers = [subprocess.Popen([sys.executable] + worker_args + ['--shard', str(i), '--num_shards', str(processes),
+                                                                          '--shard_result', result_paths[i], '--schema_manifest', schema_manifest])
+                       for i in range(processes)]
+            failed = [worker.pid for worker in workers if worker.wait() != 0]
+            if (failed):
+                raise Exception(f'Loader processes {failed} failed')
+
+            rows_inserted = 0
+            bytes_inserted = 0
+            for path in result_paths:
+                with open(path) as f:
+                    result = json.load(f)
+                rows_inserted += result['rows']
+                bytes_inserted += result['bytes']
+            return rows_inserted, bytes_inserted
+        finally:
+            for path in result_paths:
+                os.remove(path)
+
+    def load(self, rows_per_table, batch_rows = DEFAULT_BATCH_ROWS, processes = 1, worker_args = None, shard = None, num_shards = None,
+             shard_result = None, schema_manifest = None):
+        """Loads every scalability table up to rows_per_table rows
+
+        Args:
+            rows_per_table (int): Target number of rows per table
+            batch_rows (int, optional): Rows per COPY statement. Defaults to DEFAULT_BATCH_ROWS.
+            processes (int, optional): Number of worker processes to spread tables over. Defaults to 1.
+            worker_args (list, optional): Command line arguments used to launch worker processes. Defaults to None.
+            shard (int, optional): When running as a worker process, the shard of tables to load. Defaults to None.
+            num_shards (int, optional): When running as a worker process, the total number of shards. Defaults to None.
+            shard_result (str, optional): When running as a worker process, the file to write the rows and bytes inserted to. Defaults to None.
+            schema_manifest (str, optional): File the schema manifest is cached in and handed to worker processes through.
+                Defaults to None to discover the schema on every run.
+        """
+        if (shard is not None):
+            # The parent wrote the manifest right before launching the worker processes, so it is used as is
+            tables = self._get_tables(SchemaManifest.load(schema_manifest))
+            rows_inserted, bytes_inserted = self._load_shard(tables[shard::num_shards], rows_per_table, batch_rows, f'Loading shard {shard + 1}/{num_shards}')
+            if (shard_result is not None):
+                with open(shard_result, 'w') as f:
+                    json.dump({'rows': rows_inserted, 'bytes': bytes_inserted}, f)
+            return
+
+        temporary_schema_manifest = processes > 1 and schema_manifest is None
+        if (temporary_schema_manifest):
+            fd, schema_manifest = tempfile.mkstemp(prefix='schema_manifest_', suffix='.json')
+            os.close(fd)
+            os.remove(schema_manifest)
+        try:
+            self._load_all(SchemaManifest.load_or_discover(self.cluster_helper, schema_manifest), rows_per_table, batch_rows, processes,
+                           worker_args, schema_manifest)
+        finally:
+            if (temporary_schema_manifest and os.path.exists(schema_manifest)):
+                os.remove(schema_manifest)
+
+    def _load_all(self, manifest, rows_per_table, batch_rows, processes, worker_args, schema_manifest):
+        tables = self._get_tables(manifest)
+        logging.info(f'Loading {len(tables)} tables to {rows_per_table} rows each using {processes} processes')
+        start_time = time.monotonic()
+        if (processes <= 1):
+            rows_inserted, bytes_inserted = self._load_shard(tables, rows_per_table, batch_rows, 'Loading tables')
+        else:
+            rows_inserted, bytes_inserted = self._run_shards(processes, worker_args, schema_manifest)
+        self._log_summary(rows_inserted, bytes_inserted, time.monotonic() - start_time)
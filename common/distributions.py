@@ -0,0 +1,105 @@
+import random
+from array import array
+
+""" Access distributions used to pick ids (databases, tables, keys) in the range [1, n].
+    Every distribution samples in O(1); zipfian precomputes alias tables once so it stays O(1) for millions of ids.
+"""
+class UniformDistribution:
+    def __init__(self, n):
+        self.n = n
+
+    def sample(self):
+        return random.randrange(1, self.n + 1)
+
+class ZipfianDistribution:
+    def __init__(self, n, theta = 0.99):
+        """Zipfian distribution where id i is picked with probability proportional to 1 / i^theta, so id 1 is the hottest
+
+        Args:
+            n (int): Number of ids
+            theta (float, optional): Skew, higher is more skewed. Defaults to 0.99.
+        """
+        self.n = n
+        self.theta = theta
+        self._prob, self._alias = self._build_alias_tables([1 / (i ** theta) for i in range(1, n + 1)])
+
+    def _build_alias_tables(self, weights):
+        # Vose's alias method: each slot holds its own probability and an alias id taking the remainder
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        prob = array('d', [1.0]) * n
+        alias = array('l', [0]) * n
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while (small and large):
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1
+            if (scaled[l] < 1):
+                small.append(l)
+            else:
+                large.append(l)
+        return prob, alias
+
+    def sample(self):
+        i = int(random.random() * self.n)
+        if (random.random() >= self._prob[i]):
+            i = self._alias[i]
+        return i + 1
+
+class HotspotDistribution:
+    def __init__(self, n, hot_fraction = 0.2, hot_access = 0.8):
+        """Picks from the first hot_fraction of ids with probability hot_access, uniformly within the hot and cold sets
+
+        Args:
+            n (int): Number of ids
+            hot_fraction (float, optional): Fraction of ids that are hot. Defaults to 0.2.
+            hot_access (float, optional): Fraction of accesses that go to hot ids. Defaults to 0.8.
+        """
+        self.n = n
+        self.hot_access = hot_access
+        self.num_hot = min(max(int(n * hot_fraction), 1), n)
+
+    def sample(self):
+        if (self.num_hot == self.n or random.random() < self.hot_access):
+            return random.randrange(1, self.num_hot + 1)
+        return random.randrange(self.num_hot + 1, self.n + 1)
+
+class LatestDistribution:
+    def __init__(self, n, theta = 0.99):
+        """Zipfian skewed towards the highest (most recently created) ids
+
+        Args:
+            n (int): Number of ids
+            theta (float, optional): Skew, higher is more skewed. Defaults to 0.99.
+        """
+        self.n = n
+        self._zipfian = ZipfianDistribution(n, theta)
+
+    def sample(self):
+        return self.n + 1 - self._zipfian.sample()
+
+DISTRIBUTIONS = ['uniform', 'zipfian', 'hotspot', 'latest']
+
+def create_distribution(name, n, theta = 0.99, hot_fraction = 0.2, hot_access = 0.8):
+    """Creates a distribution over [1, n] by name
+
+    Args:
+        name (str): One of DISTRIBUTIONS
+        n (int): Number of ids
+        theta (float, optional): Skew of the zipfian and latest distributions. Defaults to 0.99.
+        hot_fraction (float, optional): Fraction of hot ids for the hotspot distribution. Defaults to 0.2.
+        hot_access (float, optional): Fraction of accesses to hot ids for the hotspot distribution. Defaults to 0.8.
+    """
+    if (name == 'uniform'):
+        return UniformDistribution(n)
+    elif (name == 'zipfian'):
+        return ZipfianDistribution(n, theta)
+    elif (name == 'hotspot'):
+        return HotspotDistribution(n, hot_fraction, hot_access)
+    elif (name == 'latest'):
+        return LatestDistribution(n, theta)
+    raise Exception(f'Unknown distribution: {name}')
@@ -0,0 +1,102 @@
+import atexit
+import logging
+import logging.handlers
+
+""" Low overhead logging for workload hot paths
+    Workloads log through one EventLogger per event type, each with its own level. Messages use %-style arguments
+    so nothing is formatted for disabled or sampled out events, and below WARNING only 1 in sample_rate events is
+    logged. With a buffered handler, records are formatted and written by a background thread.
+"""
+LOG_FORMAT = '%(asctime)s %(levelname)s: %(message)s'
+
+def _get_original(module, name):
+    # The buffered handler needs a real OS thread and queue even when gevent has monkey-patched them
+    try:
+        from gevent import monkey
+        return monkey.get_original(module, name)
+    except ImportError:
+        return getattr(__import__(module), name)
+
+class EventLogger:
+    def __init__(self, event_type):
+        self.logger = logging.getLogger(f'workload.{event_type}')
+        self.sample_rate = 1
+        self._count = 0
+
+    def log(self, level, msg, *args):
+        if (not self.logger.isEnabledFor(level)):
+            return
+        # Warnings and errors are never sampled out
+        if (self.sample_rate > 1 and level < logging.WARNING):
+            self._count += 1
+            if (self._count % self.sample_rate != 0):
+                return
+        self.logger.log(level, msg, *args)
+
+    def debug(self, msg, *args):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg, *args):
+        self.log(logging.WARNING, msg, *args)
+
+    def error(self, msg, *args):
+        self.log(logging.ERROR, msg, *args)
+
+# Completed (or failed) requests
+request_log = EventLogger('request')
+
+# Connections opened, switched or closed by workloads
+connect_log = EventLogger('connect')
+
+EVENT_LOGGERS = {'request': request_log, 'connect': connect_log}
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Leave formatting to the listener thread instead of the thread that logged
+        return record
+
+class _ThreadQueueListener(logging.handlers.QueueListener):
+    def start(self):
+        self._thread = _get_original('threading', 'Thread')(target=self._monitor, daemon=True)
+        self._thread.start()
+
+def parse_event_levels(value):
+    """Parses a comma separated list of event_type=LEVEL"""
+    event_levels = {}
+    for entry in value.split(','):
+        event_type, level = entry.split('=')
+        if (event_type not in EVENT_LOGGERS):
+            raise ValueError(f'Unknown event type: {event_type}')
+        event_levels[event_type] = level.upper()
+    return event_levels
+
+def configure_logging(level = 'INFO', event_levels = None, sample_rate = 1, buffered = False):
+    """Configure the root logger and the event loggers
+
+    Args:
+        level (str, optional): Root log level. Defaults to 'INFO'.
+        event_levels (dict, optional): Log level per event type, overriding the root level. Defaults to None.
+        sample_rate (int, optional): Log 1 in this many events below WARNING. Defaults to 1.
+        buffered (bool, optional): Hand records to a background thread that formats and writes them. Defaults to False.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root = logging.getLogger()
+    root.setLevel(level)
+    if (buffered):
+        queue = _get_original('queue', 'SimpleQueue')()
+        root.addHandler(_DeferredQueueHandler(queue))
+        listener = _ThreadQueueListener(queue, handler)
+        listener.start()
+        # Flush whatever is still buffered on exit
+        atexit.register(listener.stop)
+    else:
+        root.addHandler(handler)
+
+    for event_type, event_level in (event_levels or {}).items():
+        EVENT_LOGGERS[event_type].logger.setLevel(event_level)
+    for event_logger in EVENT_LOGGERS.values():
+        event_logger.sample_rate = sample_rate
@@ -1,21 +1,193 @@
 import os
+import socket
+import subprocess
+import sys
+import tempfile
 import gevent
 import logging
 from locust.env import Environment
 from locust.stats import stats_printer, stats_history, StatsCSVFileWriter
 from .workload_config import workload_config
+from .statements import StatementCache
+from .payload import PayloadGenerator
+from .key_tracker import KeyTracker
+from .timing_wrapper import TimingWrapper
+from .arrival_scheduler import ArrivalScheduler
+from .latency_recorder import LatencyRecorder
+from .metrics_exporter import MetricsExporter
+from .self_monitor import SamplingProfiler, SelfMonitor
+from .capacity_search import CapacitySearch
+from .schema_manifest import SchemaManifest
+
+class ExecutorConfig:
+    def __init__(self, *, query_mode = StatementCache.SIMPLE,
+                 processes = None, worker_args = None, master_host = None, master_port = None, timing_sample_rate = 1,
+                 target_rps = None, rps_ramp_time = 0, max_backlog = None, late_threshold_ms = 10,
+                 hdr_log = None, hdr_interval = 10, payload = None, keys_per_table = 0, range_scan_size = 100,
+                 batch_size = 10, isolation_level = 'read_committed', max_retries = 3,
+                 ddl_mix = None, ddl_rate = 1, metrics_port = None, metrics_file = None, metrics_interval = 1,
+                 saturation_cpu_percent = 90, saturation_lag_ms = 50, profile_file = None, schema_manifest = None):
+        """Executor options, given by keyword only so that adding one can't shift the others
+
+        Args:
+            query_mode (str, optional): Statement cache query mode. Defaults to StatementCache.SIMPLE.
+            processes (int, optional): Number of worker processes to launch. Defaults to None.
+            worker_args (list, optional): Command line arguments used to launch worker processes. Defaults to None.
+            master_host (str, optional): Host of the master to connect to as a worker. Defaults to None.
+            master_port (int, optional): Port of the master to connect to as a worker. Defaults to None.
+            timing_sample_rate (int, optional): Fire request events for 1 in this many timed calls. Defaults to 1.
+            target_rps (float, optional): Run open loop at this arrival rate (split across worker processes) instead of
+                closed loop with the workload wait times. Defaults to None.
+            rps_ramp_time (int, optional): Seconds to ramp up to target_rps. Defaults to 0.
+            max_backlog (int, optional): Open loop requests allowed to wait for a free user before being dropped. Defaults to None.
+            late_threshold_ms (int, optional): Open loop requests starting later than this are reported as late. Defaults to 10.
+            hdr_log (str, optional): Base name of the HDR interval histogram log to record latencies into
+                (one log per worker process). Defaults to None.
+            hdr_interval (int, optional): Seconds per interval histogram. Defaults to 10.
+            payload (PayloadGenerator, optional): Generator of inserted row values. Defaults to a PayloadGenerator with default sizes.
+            keys_per_table (int, optional): Keys assumed to exist in every table for key lookups. Defaults to 0.
+            range_scan_size (int, optional): Number of keys covered by each range scan. Defaults to 100.
+            batch_size (int, optional): Rows written per multi-row insert or explicit transaction. Defaults to 10.
+            isolation_level (str, optional): Isolation level of explicit transactions. Defaults to 'read_committed'.
+            max_retries (int, optional): Times a transaction that hit a conflict is retried. Defaults to 3.
+            ddl_mix (dict, optional): Weight of each DDL type run by DDL churn users. Defaults to None.
+            ddl_rate (float, optional): DDL operations per second per DDL churn user. Defaults to 1.
+            metrics_port (int, optional): Port to serve live Prometheus metrics on. Defaults to None.
+            metrics_file (str, optional): File to append live metrics to in line protocol. Defaults to None.
+            metrics_interval (int, optional): Seconds between live metrics snapshots. Defaults to 1.
+            saturation_cpu_percent (float, optional): Load generator CPU percent at which intervals are reported as saturated. Defaults to 90.
+            saturation_lag_ms (float, optional): Load generator loop lag at which intervals are reported as saturated. Defaults to 50.
+            profile_file (str, optional): Base name of the file to write sampling profiler stacks to
+                (one file per worker process). Defaults to None.
+            schema_manifest (str, optional): File the schema manifest is cached in and handed to worker processes through.
+                Defaults to None to discover the schema on every run.
+        """
+        self.query_mode = query_mode
+        self.processes = processes
+        self.worker_args = worker_args
+        self.master_host = master_host
+        self.master_port = master_port
+        self.timing_sample_rate = timing_sample_rate
+        self.target_rps = target_rps
+        self.rps_ramp_time = rps_ramp_time
+        self.max_backlog = max_backlog
+        self.late_threshold_ms = late_threshold_ms
+        self.hdr_log = hdr_log
+        self.hdr_interval = hdr_interval
+        self.payload = payload
+        self.keys_per_table = keys_per_table
+        self.range_scan_size = range_scan_size
+        self.batch_size = batch_size
+        self.isolation_level = isolation_level
+        self.max_retries = max_retries
+        self.ddl_mix = ddl_mix
+        self.ddl_rate = ddl_rate
+        self.metrics_port = metrics_port
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self.saturation_cpu_percent = saturation_cpu_percent
+        self.saturation_lag_ms = saturation_lag_ms
+        self.profile_file = profile_file
+        self.schema_manifest = schema_manifest
 
 class Executor:
-    def __init__(self, cluster_helper, workloads, csv_path):
+    # Seconds to wait for worker processes to connect to the master
+    WORKER_CONNECT_TIMEOUT = 60
+
+    def __init__(self, cluster_helper, workloads, csv_path, config = None):
+        """Initialize executor
+
+        Runs as a single local process by default. If config.processes is set, runs as a locust master that
+        launches that many worker processes (each with its own gevent loop) and aggregates their stats.
+        If config.master_port is set, runs as one of those workers.
+
+        Args:
+            cluster_helper (ClusterHelper): Cluster helper
+            workloads (list): Workload user classes
+            csv_path (str): CSV file base name, or None to not write CSV stats
+            config (ExecutorConfig, optional): Executor options. Defaults to an ExecutorConfig with default options.
+        """
+        config = config if config is not None else ExecutorConfig()
+        self.processes = config.processes
+        self.worker_args = config.worker_args
+        self.worker_processes = []
+        self.is_worker = config.master_port is not None
+        self.target_rps = config.target_rps
+        self.scheduler = None
+        self.metrics_exporter = None
+        self.monitor = None
+        self.profiler = None
 
         # Setup Enviroment and Runner
         self.env = Environment(user_classes=workloads)
-        self.env.create_local_runner()
+        if (self.is_worker):
+            self.env.create_worker_runner(config.master_host, config.master_port)
+        elif (config.processes is not None):
+            self.master_port = self._get_free_port()
+            self.env.create_master_runner('127.0.0.1', self.master_port)
+        else:
+            self.env.create_local_runner()
 
         # Setup workload config
         workload_config.cluster_helper = cluster_helper
-        workload_config.num_databases = cluster_helper.get_num_databases()
-        workload_config.num_tables = cluster_helper.get_num_tables(cluster_helper.get_db_name(1))
+        workload_config.statements = StatementCache(config.query_mode)
+        workload_config.payload = config.payload if config.payload is not None else PayloadGenerator()
+        workload_config.key_tracker = KeyTracker(config.keys_per_table)
+        workload_config.range_scan_size = config.range_scan_size
+        workload_config.batch_size = config.batch_size
+        workload_config.isolation_level = config.isolation_level
+        workload_config.max_retries = config.max_retries
+        workload_config.ddl_mix = config.ddl_mix if config.ddl_mix is not None else {}
+        workload_config.ddl_rate = config.ddl_rate
+
+        # Only the process that runs users schedules, records and monitors them: a local runner or a worker (which is
+        # launched with the master's arguments, so --processes is set there too), never the master
+        runs_users = self.is_worker or config.processes is None
+
+        # In open loop mode users pick up requests from the arrival scheduler instead of waiting between tasks
+        if (config.target_rps is not None and runs_users):
+            self.scheduler = ArrivalScheduler(self.env, config.target_rps, config.rps_ramp_time, config.max_backlog, config.late_threshold_ms)
+            for workload in workloads:
+                workload.wait_time = self.scheduler.wait_time
+            self.env.events.test_start.add_listener(lambda **kwargs: self.scheduler.start())
+            self.env.events.test_stop.add_listener(lambda **kwargs: self.scheduler.stop())
+
+        # Latencies are recorded where users run, so each worker process writes its own log
+        self.recorder = None
+        if (config.hdr_log is not None and runs_users):
+            self.recorder = LatencyRecorder(f'{config.hdr_log}_{os.getpid()}.hlog' if self.is_worker else f'{config.hdr_log}.hlog', config.hdr_interval)
+            self.env.events.test_start.add_listener(lambda **kwargs: self.recorder.start())
+            self.env.events.test_stop.add_listener(lambda **kwargs: self.recorder.stop())
+
+        # Watch for the load generator itself becoming the bottleneck in every process that runs users
+        if (runs_users):
+            self.monitor = SelfMonitor(self.env, 1, config.saturation_cpu_percent, config.saturation_lag_ms, self.scheduler)
+            self.env.events.test_start.add_listener(lambda **kwargs: self.monitor.start())
+            self.env.events.test_stop.add_listener(lambda **kwargs: self.monitor.stop())
+            if (config.profile_file is not None):
+                self.profiler = SamplingProfiler(f'{config.profile_file}_{os.getpid()}.txt' if self.is_worker else f'{config.profile_file}.txt')
+                self.env.events.test_start.add_listener(lambda **kwargs: self.profiler.start())
+                self.env.events.test_stop.add_listener(lambda **kwargs: self.profiler.stop())
+
+        TimingWrapper.configure(config.timing_sample_rate, self.scheduler.take_intended_start if self.scheduler is not None else None, self.recorder)
+        # Discover the schema once; worker processes load it from the file the master wrote
+        schema_manifest = config.schema_manifest
+        self.temporary_schema_manifest = config.processes is not None and schema_manifest is None
+        if (self.temporary_schema_manifest):
+            fd, schema_manifest = tempfile.mkstemp(prefix='schema_manifest_', suffix='.json')
+            os.close(fd)
+            os.remove(schema_manifest)
+        self.schema_manifest = schema_manifest
+        if (self.is_worker):
+            # The master wrote the manifest right before launching the workers, so it is used as is
+            manifest = SchemaManifest.load(schema_manifest)
+        else:
+            # Discovery connects to every database from parallel greenlets
+            cluster_helper.ybconnection.enable_cooperative_wait()
+            manifest = SchemaManifest.load_or_discover(cluster_helper, schema_manifest)
+        cluster_helper.use_manifest(manifest)
+        workload_config.num_databases = len(manifest.databases)
+        workload_config.num_tables = len(manifest.common_tables)
 
         if (workload_config.num_databases < 1):
             raise Exception(f'Invalid number of databases specified: {workload_config.num_databases}')
@@ -25,6 +197,14 @@ class Executor:
 
         logging.info(f'Number of database: {workload_config.num_databases}, number of tables: {workload_config.num_tables}')
 
+        # Pooled connections that time out are reported as failures
+        if (cluster_helper.ybconnection.pool is not None):
+            cluster_helper.ybconnection.pool.environment = self.env
+
+        # Stats are reported to and aggregated by the master
+        if (self.is_worker):
+            return
+
         # Start web UI instance
         # self.env.create_web_ui("127.0.0.1", 8089)
 
@@ -40,18 +220,100 @@ class Executor:
                 environment = self.env,
                 base_filepath = csv_path, #os.path.join(os.getcwd(), "stats"),
                 full_history = True,
-                percentiles_to_report = [0.5,0.75,0.9,0.95,0.99])
+                percentiles_to_report = [0.5,0.75,0.9,0.95,0.99,0.999,0.9999])
             gevent.spawn(csv_writer)
 
-    def execute(self, num_users, spawn_rate, execution_time):
-        # Start the test
-        self.env.runner.start(num_users, spawn_rate=spawn_rate)
+        # Start live metrics export
+        if (config.metrics_port is not None or config.metrics_file is not None):
+            self.metrics_exporter = MetricsExporter(self.env, config.metrics_port, config.metrics_file, config.metrics_interval)
+            self.metrics_exporter.start()
+
+    def _get_free_port(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
 
-        # Stop the runner after timeout
-        gevent.spawn_later(execution_time, lambda: self.env.runner.quit())
+    def _start_workers(self):
+        command = [sys.executable] + self.worker_args + ['--master_host', '127.0.0.1', '--master_port', str(self.master_port),
+                                                         '--schema_manifest', self.schema_manifest]
 
-        # Wait for the greenlets
-        self.env.runner.greenlet.join()
+        # Each worker schedules its share of the arrival rate
+        if (self.target_rps is not None):
+            command += ['--target_rps', str(self.target_rps / self.processes)]
+        for _ in range(self.processes):
+            self.worker_processes.append(subprocess.Popen(command))
+
+        # Wait for all workers to report in before starting the test
+        with gevent.Timeout(self.WORKER_CONNECT_TIMEOUT, Exception(f'Timed out waiting for {self.processes} worker processes to connect')):
+            while (len(self.env.runner.clients.ready) < self.processes):
+                gevent.sleep(0.5)
+        logging.info(f'{self.processes} worker processes connected')
+
+    def _stop_workers(self):
+        for process in self.worker_processes:
+            try:
+                process.wait(timeout=self.WORKER_CONNECT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                logging.warning(f'Killing worker process {process.pid} that did not exit')
+                process.kill()
+
+    def _log_node_summary(self):
+        load_balancer = workload_config.cluster_helper.ybconnection.load_balancer
+        if (load_balancer is not None):
+            load_balancer.log_summary()
+
+    def _check_pool_size(self, num_users):
+        # Users hold a pooled connection between tasks, so users beyond the pools' capacity wait and eventually time out
+        pool = workload_config.cluster_helper.ybconnection.pool
+        if (pool is None):
+            return
+        capacity = pool.max_size * workload_config.num_databases * (self.processes if self.processes is not None else 1)
+        if (num_users > capacity):
+            logging.warning(f'{num_users} users exceed the {capacity} pooled connections ({pool.max_size} per database per process), '
+                            f'users that can\'t get a connection within {pool.acquire_timeout} secs fail to start')
+
+    def _run(self, drive):
+        # Workers run users on behalf of the master until the master tells them to quit
+        if (self.is_worker):
+            self.env.runner.greenlet.join()
+            self._log_node_summary()
+            return
+
+        if (self.processes is not None):
+            self._start_workers()
+
+        try:
+            drive()
+        finally:
+            self._stop_workers()
+            if (self.temporary_schema_manifest):
+                os.remove(self.schema_manifest)
+            if (self.metrics_exporter is not None):
+                self.metrics_exporter.stop()
+        self._log_node_summary()
 
         # Stop the web server
         #self.env.web_ui.stop()
+
+    def execute(self, num_users, spawn_rate, execution_time):
+        self._check_pool_size(num_users)
+
+        def drive():
+            # Start the test
+            self.env.runner.start(num_users, spawn_rate=spawn_rate)
+
+            # Stop the runner after timeout
+            gevent.spawn_later(execution_time, lambda: self.env.runner.quit())
+
+            # Wait for the greenlets
+            self.env.runner.greenlet.join()
+
+        self._run(drive)
+
+    def find_capacity(self, start_users, step_users, max_users, spawn_rate, p99_slo_ms, error_rate_slo, result_path,
+                      window = 10, max_stage_time = 120, settle_tolerance = 0.05):
+        """Steps up the number of users until the p99 latency or error rate SLO is breached (see CapacitySearch)"""
+        self._check_pool_size(max_users)
+        search = CapacitySearch(self.env, start_users, step_users, max_users, spawn_rate, p99_slo_ms, error_rate_slo, result_path,
+                                window, max_stage_time, settle_tolerance)
+        self._run(search.run)
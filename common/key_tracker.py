@@ -0,0 +1,35 @@
+import random
+
+""" Tracks keys known to exist in every table in memory, so that lookups hit existing rows without querying the table.
+    Sequences cache values per session and rolled back inserts consume values, so the keys of a table have gaps:
+    only keys that were loaded or returned by an insert are handed out, never guesses from the key range.
+"""
+class KeyTracker:
+    # Inserted keys kept per table and column; beyond this, new keys replace random older ones
+    MAX_INSERTED_KEYS = 10000
+
+    def __init__(self, initial_keys = 0):
+        """Initialize key tracker
+
+        Args:
+            initial_keys (int, optional): Keys (k and v4 values) 1 to initial_keys assumed to exist in every table before the run,
+                e.g. the row count used by the load subcommand. Defaults to 0.
+        """
+        self.initial_keys = initial_keys
+        self._inserted_keys = {}
+
+    def add_key(self, dbname, table_name, key, column = 'k'):
+        keys = self._inserted_keys.setdefault((dbname, table_name, column), [])
+        if (len(keys) < self.MAX_INSERTED_KEYS):
+            keys.append(key)
+        else:
+            keys[random.randrange(len(keys))] = key
+
+    def random_key(self, dbname, table_name, column = 'k'):
+        """Returns a random known key of the table, or None if no keys are known"""
+        keys = self._inserted_keys.get((dbname, table_name, column), ())
+        num_keys = self.initial_keys + len(keys)
+        if (num_keys == 0):
+            return None
+        i = random.randrange(num_keys)
+        return i + 1 if i < self.initial_keys else keys[i - self.initial_keys]
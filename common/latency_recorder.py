@@ -0,0 +1,135 @@
+import logging
+import re
+import time
+import gevent
+
+try:
+    from hdrh.histogram import HdrHistogram
+except ImportError:
+    HdrHistogram = None
+
+""" Records latencies into HDR histograms with microsecond resolution, one per request type and name.
+    Interval histograms are appended to a log in the HdrHistogram interval log format (version 1.3, one tag per
+    request type), so logs written by several processes or machines can be merged after the run.
+"""
+# Recordable range and precision: 1 us to 1 hour with 3 significant digits, fixed memory per histogram
+LOWEST_TRACKABLE_US = 1
+HIGHEST_TRACKABLE_US = 3600 * 1000 * 1000
+SIGNIFICANT_FIGURES = 3
+
+# Interval_Max values in the log are written in ms
+MAX_VALUE_UNIT_RATIO = 1000
+
+REPORTED_PERCENTILES = [50, 90, 99, 99.9, 99.99]
+
+def _new_histogram():
+    if (HdrHistogram is None):
+        raise Exception('HDR histogram recording requires the hdrh package')
+    return HdrHistogram(LOWEST_TRACKABLE_US, HIGHEST_TRACKABLE_US, SIGNIFICANT_FIGURES)
+
+def _log_summary(histograms):
+    for tag in sorted(histograms):
+        histogram = histograms[tag]
+        percentiles = ', '.join(f'p{p}: {histogram.get_value_at_percentile(p) / 1000:.3f} ms' for p in REPORTED_PERCENTILES)
+        logging.info(f'{tag}: count: {histogram.get_total_count()}, {percentiles}, max: {histogram.get_max_value() / 1000:.3f} ms')
+
+class LatencyRecorder:
+    def __init__(self, log_path, interval = 10):
+        """Initialize latency recorder
+
+        Args:
+            log_path (str): Path of the interval histogram log to write
+            interval (int, optional): Seconds covered by each interval histogram. Defaults to 10.
+        """
+        # Fail early if hdrh is missing
+        _new_histogram()
+        self.log_path = log_path
+        self.interval = interval
+        self._interval_histograms = {}
+        self._total_histograms = {}
+        self._log_file = None
+        self._flusher = None
+        self.start_time = None
+        self._interval_start = None
+
+    def record(self, request_type, name, response_time_ms):
+        tag = f'{request_type}.{name}'
+        histogram = self._interval_histograms.get(tag)
+        if (histogram is None):
+            histogram = self._interval_histograms[tag] = _new_histogram()
+        histogram.record_value(min(max(int(response_time_ms * 1000), LOWEST_TRACKABLE_US), HIGHEST_TRACKABLE_US))
+
+    def start(self):
+        self.start_time = time.time()
+        self._interval_start = self.start_time
+        self._log_file = open(self.log_path, 'w')
+        self._log_file.write('#[Histogram log format version 1.3]\n')
+        self._log_file.write(f'#[StartTime: {self.start_time:.3f} (seconds since epoch), {time.ctime(self.start_time)}]\n')
+        self._log_file.write('#[Values in microseconds, Interval_Max in milliseconds]\n')
+        self._log_file.write('"StartTimestamp","Interval_Length","Interval_Max","Interval_Compressed_Histogram"\n')
+        self._flusher = gevent.spawn(self._flush_periodically)
+
+    def stop(self):
+        if (self._flusher is not None):
+            self._flusher.kill()
+            self._flusher = None
+        if (self._log_file is not None):
+            self._flush()
+            self._log_file.close()
+            self._log_file = None
+            _log_summary(self._total_histograms)
+
+    def _flush_periodically(self):
+        while True:
+            gevent.sleep(self.interval)
+            self._flush()
+
+    def _flush(self):
+        now = time.time()
+        for tag, histogram in self._interval_histograms.items():
+            if (histogram.get_total_count() == 0):
+                continue
+            self._log_file.write(f'Tag={re.sub("[, ]", "_", tag)},{self._interval_start - self.start_time:.3f},{now - self._interval_start:.3f},'
+                                 f'{histogram.get_max_value() / MAX_VALUE_UNIT_RATIO:.3f},{histogram.encode().decode()}\n')
+            total = self._total_histograms.get(tag)
+            if (total is None):
+                total = self._total_histograms[tag] = _new_histogram()
+            total.add(histogram)
+            histogram.reset()
+        self._log_file.flush()
+        self._interval_start = now
+
+def merge_histogram_logs(log_paths, output_path = None):
+    """Merges interval histogram logs (e.g. one per worker process or machine) per tag
+
+    Args:
+        log_paths (list): Paths of interval histogram logs written by LatencyRecorder
+        output_path (str, optional): If given, write the merged histograms as a single interval log. Defaults to None.
+
+    Returns:
+        Dict of tag to merged histogram
+    """
+    merged = {}
+    for log_path in log_paths:
+        with open(log_path) as f:
+            for line in f:
+                if (not line.startswith('Tag=')):
+                    continue
+                tag_field, _, _, _, encoded = line.strip().split(',', 4)
+                tag = tag_field[len('Tag='):]
+                histogram = merged.get(tag)
+                if (histogram is None):
+                    histogram = merged[tag] = _new_histogram()
+                histogram.decode_and_add(encoded)
+
+    _log_summary(merged)
+
+    if (output_path is not None):
+        with open(output_path, 'w') as f:
+            f.write('#[Histogram log format version 1.3]\n')
+            f.write(f'#[Merged from {len(log_paths)} logs]\n')
+            f.write('#[Values in microseconds, Interval_Max in milliseconds]\n')
+            f.write('"StartTimestamp","Interval_Length","Interval_Max","Interval_Compressed_Histogram"\n')
+            for tag, histogram in sorted(merged.items()):
+                f.write(f'Tag={tag},0.000,0.000,{histogram.get_max_value() / MAX_VALUE_UNIT_RATIO:.3f},{histogram.encode().decode()}\n')
+    return merged
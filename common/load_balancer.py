@@ -0,0 +1,134 @@
+import logging
+import random
+import time
+from collections import Counter
+
+""" Spreads new connections across the nodes of a cluster
+    Nodes come from a host list or from yb_servers(). Nodes that fail to accept a connection are taken out of
+    rotation for a while, and connection counts, connect latency and the latency of requests timed on each node's
+    connections are tracked per node.
+"""
+class Node:
+    def __init__(self, host, port, cloud = None, region = None, zone = None):
+        self.host = host
+        self.port = port
+        self.cloud = cloud
+        self.region = region
+        self.zone = zone
+        self.num_connections = 0
+        self.num_connects = 0
+        self.num_failures = 0
+        self.total_connect_ms = 0
+        self.num_requests = 0
+        self.total_request_ms = 0
+        # Number of requests by response time rounded to the ms
+        self.request_times = Counter()
+        # Monotonic time until which the node is out of rotation
+        self.unhealthy_until = 0
+
+    def __str__(self):
+        return f'{self.host}:{self.port}'
+
+    def record_request(self, response_time):
+        self.num_requests += 1
+        self.total_request_ms += response_time
+        self.request_times[round(response_time)] += 1
+
+    def request_percentile(self, percentile):
+        # Response time (ms) at the given percentile of the requests recorded on this node
+        target = percentile * self.num_requests
+        num_seen = 0
+        for response_time in sorted(self.request_times):
+            num_seen += self.request_times[response_time]
+            if (num_seen >= target):
+                return response_time
+        return 0
+
+    def placement(self):
+        return f'{self.cloud}.{self.region}.{self.zone}'
+
+    def in_zones(self, zones):
+        # Zones can be given either as a bare zone name or as cloud.region.zone
+        return self.zone in zones or self.placement() in zones
+
+class LoadBalancer:
+    STRATEGIES = ['round_robin', 'least_connections', 'zone']
+
+    def __init__(self, nodes, strategy = 'round_robin', preferred_zones = None, unhealthy_timeout = 30):
+        """Initialize load balancer
+
+        Args:
+            nodes (list): Nodes to balance connections across
+            strategy (str, optional): One of STRATEGIES. 'zone' picks the least loaded node in preferred_zones,
+                falling back to other zones when none of them is healthy. Defaults to 'round_robin'.
+            preferred_zones (list, optional): Zones preferred by the zone strategy. Defaults to None.
+            unhealthy_timeout (int, optional): Seconds a node that failed to accept a connection stays out of rotation. Defaults to 30.
+        """
+        if (not nodes):
+            raise Exception('No nodes to balance connections across')
+        if (strategy not in self.STRATEGIES):
+            raise Exception(f'Unknown load balancing strategy: {strategy}')
+        if (strategy == 'zone' and not preferred_zones):
+            raise Exception('The zone load balancing strategy requires preferred zones')
+
+        self.nodes = nodes
+        self.strategy = strategy
+        self.preferred_zones = set(preferred_zones or [])
+        self.unhealthy_timeout = unhealthy_timeout
+        # Start at a random node so that separate processes don't all begin with the same one
+        self._next = random.randrange(len(nodes))
+
+    def _healthy_nodes(self):
+        now = time.monotonic()
+        healthy = [node for node in self.nodes if node.unhealthy_until <= now]
+        # With every node down, keep trying all of them rather than failing outright
+        return healthy if healthy else self.nodes
+
+    def pick(self):
+        """Returns the node the next connection should go to"""
+        nodes = self._healthy_nodes()
+        if (self.strategy == 'round_robin'):
+            self._next = (self._next + 1) % len(self.nodes)
+            # Skip ahead to the next healthy node in rotation order
+            for i in range(len(self.nodes)):
+                node = self.nodes[(self._next + i) % len(self.nodes)]
+                if (node in nodes):
+                    self._next = (self._next + i) % len(self.nodes)
+                    return node
+        if (self.strategy == 'zone'):
+            nodes = [node for node in nodes if node.in_zones(self.preferred_zones)] or nodes
+        return min(nodes, key=lambda node: node.num_connections)
+
+    def on_connect(self, node, latency_ms):
+        node.num_connections += 1
+        node.num_connects += 1
+        node.total_connect_ms += latency_ms
+
+    def on_close(self, node):
+        node.num_connections -= 1
+
+    def on_failure(self, node, error):
+        node.num_failures += 1
+        node.unhealthy_until = time.monotonic() + self.unhealthy_timeout
+        logging.warning(f'Taking node {node} out of rotation for {self.unhealthy_timeout} secs: {error}')
+
+    def log_summary(self):
+        for node in self.nodes:
+            avg_connect_ms = node.total_connect_ms / node.num_connects if node.num_connects else 0
+            avg_request_ms = node.total_request_ms / node.num_requests if node.num_requests else 0
+            logging.info(f'Node {node} ({node.placement()}): {node.num_connections} open connections, {node.num_connects} connects, '
+                         f'{node.num_failures} failures, average connect latency {int(avg_connect_ms)} ms, {node.num_requests} requests, '
+                         f'request latency average {int(avg_request_ms)} ms, p50 {node.request_percentile(0.5)} ms, p99 {node.request_percentile(0.99)} ms')
+
+def parse_hosts(hosts, default_port):
+    """Parses a comma separated list of host or host:port into nodes"""
+    nodes = []
+    for entry in hosts.split(','):
+        entry = entry.strip()
+        # Bare IPv6 addresses contain several colons and never a port
+        if (entry.count(':') == 1):
+            host, port = entry.split(':')
+        else:
+            host, port = entry, default_port
+        nodes.append(Node(host, port))
+    return nodes
@@ -0,0 +1,171 @@
+import logging
+import time
+import gevent
+from gevent.pywsgi import WSGIServer
+from locust.stats import calculate_response_time_percentile
+
+""" Streams live metrics while a workload runs
+    Every interval, the locust stats are diffed against the previous interval to get the throughput, error count and
+    latency percentiles of that interval for each request type and name, and for all requests together (exported
+    under metric names of their own, workload_all_* and all_requests, so that summing the per request series doesn't
+    count every request twice). The latest snapshot is served on an HTTP
+    /metrics endpoint in the Prometheus exposition format, and every snapshot is appended to a file in the InfluxDB
+    line protocol. Work is done once per interval (and per scrape), never per request.
+"""
+EXPORTED_PERCENTILES = [0.5, 0.9, 0.99, 0.999]
+
+def _prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _line_protocol_tag(value):
+    return str(value).replace(',', '\\,').replace('=', '\\=').replace(' ', '\\ ')
+
+def interval_percentiles(response_times, previous_response_times, percentiles):
+    """Returns latency percentiles (ms) of the requests logged between two copies of a stats entry's response_times,
+    which are cumulative counts per rounded response time, or an empty dict if no request was timed in between"""
+    interval_response_times = {}
+    for bucket, count in response_times.items():
+        count -= previous_response_times.get(bucket, 0)
+        if (count > 0):
+            interval_response_times[bucket] = count
+    num_timed = sum(interval_response_times.values())
+    if (num_timed == 0):
+        return {}
+    return {p: calculate_response_time_percentile(interval_response_times, num_timed, p) for p in percentiles}
+
+class _IntervalSnapshot:
+    def __init__(self, request_type, name, num_requests, num_failures, interval_requests, interval_failures, rps, percentiles):
+        self.request_type = request_type
+        self.name = name
+        self.num_requests = num_requests
+        self.num_failures = num_failures
+        self.interval_requests = interval_requests
+        self.interval_failures = interval_failures
+        self.rps = rps
+        # Interval latency in ms by percentile, empty when there were no requests in the interval
+        self.percentiles = percentiles
+
+class MetricsExporter:
+    def __init__(self, env, port = None, line_protocol_path = None, interval = 1):
+        """Initialize metrics exporter
+
+        Args:
+            env (Environment): Locust environment whose stats are exported
+            port (int, optional): Port to serve /metrics on. Defaults to None to not serve metrics.
+            line_protocol_path (str, optional): File to append line protocol metrics to. Defaults to None.
+            interval (int, optional): Seconds between snapshots. Defaults to 1.
+        """
+        self.env = env
+        self.port = port
+        self.line_protocol_path = line_protocol_path
+        self.interval = interval
+        self.snapshots = []
+        self.total_snapshot = None
+        self.user_count = 0
+        self._previous = {}
+        self._last_time = None
+        self._server = None
+        self._file = None
+        self._greenlet = None
+
+    def start(self):
+        self._last_time = time.monotonic()
+        if (self.port is not None):
+            self._server = WSGIServer(('', self.port), self._handle_request, log=None)
+            self._server.start()
+            logging.info(f'Serving metrics on http://0.0.0.0:{self.port}/metrics')
+        if (self.line_protocol_path is not None):
+            self._file = open(self.line_protocol_path, 'a')
+        self._greenlet = gevent.spawn(self._run)
+
+    def stop(self):
+        if (self._greenlet is not None):
+            self._greenlet.kill()
+            self._greenlet = None
+            # Export whatever happened since the last snapshot
+            self._take_snapshot()
+        if (self._server is not None):
+            self._server.stop()
+            self._server = None
+        if (self._file is not None):
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while True:
+            gevent.sleep(self.interval)
+            self._take_snapshot()
+
+    def _snapshot(self, entry, elapsed):
+        key = (entry.method, entry.name)
+        previous_requests, previous_failures, previous_response_times = self._previous.get(key, (0, 0, {}))
+        interval_requests = entry.num_requests - previous_requests
+        interval_failures = entry.num_failures - previous_failures
+
+        percentiles = interval_percentiles(entry.response_times, previous_response_times, EXPORTED_PERCENTILES) if interval_requests > 0 else {}
+        self._previous[key] = (entry.num_requests, entry.num_failures, dict(entry.response_times))
+
+        return _IntervalSnapshot(entry.method or 'all', entry.name, entry.num_requests, entry.num_failures,
+                                 interval_requests, interval_failures, interval_requests / elapsed, percentiles)
+
+    def _take_snapshot(self):
+        now = time.monotonic()
+        elapsed = max(now - self._last_time, 1e-6)
+        self._last_time = now
+
+        self.snapshots = [self._snapshot(entry, elapsed) for entry in self.env.stats.entries.values()]
+        self.total_snapshot = self._snapshot(self.env.stats.total, elapsed)
+        self.user_count = self.env.runner.user_count if self.env.runner is not None else 0
+
+        if (self._file is not None):
+            self._file.write(self._render_line_protocol(time.time_ns()))
+            self._file.flush()
+
+    def _line_protocol_fields(self, snapshot):
+        fields = [f'requests={snapshot.interval_requests}i', f'failures={snapshot.interval_failures}i', f'rps={snapshot.rps:.3f}']
+        fields += [f'p{p * 100:g}={value}' for p, value in snapshot.percentiles.items()]
+        return ",".join(fields)
+
+    def _render_line_protocol(self, timestamp_ns):
+        lines = [f'users value={self.user_count}i {timestamp_ns}']
+        for snapshot in self.snapshots:
+            lines.append(f'requests,type={_line_protocol_tag(snapshot.request_type)},name={_line_protocol_tag(snapshot.name)} '
+                         f'{self._line_protocol_fields(snapshot)} {timestamp_ns}')
+        if (self.total_snapshot is not None):
+            lines.append(f'all_requests {self._line_protocol_fields(self.total_snapshot)} {timestamp_ns}')
+        return '\n'.join(lines) + '\n'
+
+    def _render_prometheus(self):
+        lines = ['# HELP workload_users Number of running users', '# TYPE workload_users gauge', f'workload_users {self.user_count}',
+                 '# HELP workload_requests_total Requests completed', '# TYPE workload_requests_total counter']
+        labels = [f'type="{_prometheus_label(s.request_type)}",name="{_prometheus_label(s.name)}"' for s in self.snapshots]
+        lines += [f'workload_requests_total{{{label}}} {s.num_requests}' for label, s in zip(labels, self.snapshots)]
+        lines += ['# HELP workload_failures_total Requests failed', '# TYPE workload_failures_total counter']
+        lines += [f'workload_failures_total{{{label}}} {s.num_failures}' for label, s in zip(labels, self.snapshots)]
+        lines += ['# HELP workload_requests_per_second Throughput over the last interval', '# TYPE workload_requests_per_second gauge']
+        lines += [f'workload_requests_per_second{{{label}}} {s.rps:.3f}' for label, s in zip(labels, self.snapshots)]
+        lines += ['# HELP workload_response_time_ms Response time percentiles over the last interval', '# TYPE workload_response_time_ms gauge']
+        lines += [f'workload_response_time_ms{{{label},quantile="{p}"}} {value}'
+                  for label, s in zip(labels, self.snapshots) for p, value in s.percentiles.items()]
+
+        # The aggregate of all requests has metrics of its own, so that summing the series above doesn't count it twice
+        total = self.total_snapshot
+        if (total is not None):
+            lines += ['# HELP workload_all_requests_total Requests of every type completed', '# TYPE workload_all_requests_total counter',
+                      f'workload_all_requests_total {total.num_requests}',
+                      '# HELP workload_all_failures_total Requests of every type failed', '# TYPE workload_all_failures_total counter',
+                      f'workload_all_failures_total {total.num_failures}',
+                      '# HELP workload_all_requests_per_second Throughput of every request type over the last interval',
+                      '# TYPE workload_all_requests_per_second gauge', f'workload_all_requests_per_second {total.rps:.3f}',
+                      '# HELP workload_all_response_time_ms Response time percentiles of every request type over the last interval',
+                      '# TYPE workload_all_response_time_ms gauge']
+            lines += [f'workload_all_response_time_ms{{quantile="{p}"}} {value}' for p, value in total.percentiles.items()]
+        return '\n'.join(lines) + '\n'
+
+    def _handle_request(self, environ, start_response):
+        if (environ.get('PATH_INFO') != '/metrics'):
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not Found\n']
+        body = self._render_prometheus().encode()
+        start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'), ('Content-Length', str(len(body)))])
+        return [body]
@@ -0,0 +1,87 @@
+import logging
+import time
+import gevent
+
+""" Helpers to fan cluster-wide operations out over a bounded number of concurrent workers
+"""
+class ProgressReporter:
+    def __init__(self, description, total, unit = 'objects', interval = 5):
+        """Tracks progress of a long running operation and periodically logs throughput
+
+        Args:
+            description (str): What is being processed (e.g. 'Creating tables')
+            total (int): Total number of objects to process
+            unit (str, optional): Unit used when reporting throughput. Defaults to 'objects'.
+            interval (int, optional): Minimum number of seconds between reports. Defaults to 5.
+        """
+        self.description = description
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.done = 0
+        self.bytes_done = 0
+        self.start_time = time.monotonic()
+        self._last_report = self.start_time
+
+    def add(self, count = 1, num_bytes = 0):
+        self.done += count
+        self.bytes_done += num_bytes
+        now = time.monotonic()
+        if (now - self._last_report >= self.interval):
+            self._last_report = now
+            self._report(now)
+
+    def finish(self):
+        self._report(time.monotonic())
+
+    def _report(self, now):
+        elapsed = now - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0
+        byte_rate = f', {self.bytes_done / elapsed / (1024 * 1024):.1f} MB/sec' if self.bytes_done and elapsed > 0 else ''
+        logging.info(f'{self.description}: {self.done}/{self.total} {self.unit} in {elapsed:.1f} secs ({rate:.1f} {self.unit}/sec{byte_rate})')
+
+def retry(func, attempts = 3, delay = 1, retryable = (Exception,), description = None):
+    """Calls func, retrying with exponential backoff when it raises a retryable exception
+
+    Args:
+        func (callable): Function to call without arguments
+        attempts (int, optional): Maximum number of attempts. Defaults to 3.
+        delay (int, optional): Seconds to wait before the first retry, doubled for each further retry. Defaults to 1.
+        retryable (tuple, optional): Exception types considered transient. Defaults to (Exception,).
+        description (str, optional): Description of the operation used when logging retries
+
+    Returns:
+        The return value of func
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return func()
+        except retryable as e:
+            if (attempt == attempts):
+                raise
+            logging.warning(f'{description or "Operation"} failed (attempt {attempt}/{attempts}), retrying in {delay} secs: {e}')
+            gevent.sleep(delay)
+            delay *= 2
+
+def run_in_parallel(items, worker, concurrency):
+    """Processes items with up to concurrency workers running in parallel greenlets
+
+    Each worker is invoked once with an iterator shared by all workers, so that per-worker state
+    (e.g. a connection) is set up once and then reused for every item the worker pulls.
+    The first exception raised by a worker stops the remaining workers and is re-raised.
+
+    Args:
+        items (iterable): Items to process
+        worker (callable): Called with the shared item iterator
+        concurrency (int): Maximum number of concurrent workers
+    """
+    items = list(items)
+    if (not items):
+        return
+
+    shared_items = iter(items)
+    greenlets = [gevent.spawn(worker, shared_items) for _ in range(min(max(concurrency, 1), len(items)))]
+    try:
+        gevent.joinall(greenlets, raise_error=True)
+    finally:
+        gevent.killall(greenlets)
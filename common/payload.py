@@ -0,0 +1,71 @@
+import os
+import random
+
+""" Random row payloads sliced from a pool of random letters that is refilled in bulk,
+    instead of picking every character with its own random call
+"""
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+
+# Maps every random byte onto a letter (slightly favoring the first 22 letters, which is fine for payloads)
+_TRANSLATION = bytes(ord(ALPHABET[b % len(ALPHABET)]) for b in range(256))
+
+class PayloadGenerator:
+    SIZE_DISTRIBUTIONS = ['fixed', 'uniform']
+    DEFAULT_POOL_SIZE = 1024 * 1024
+
+    def __init__(self, v1_size = 40, v3_size = 100, size_distribution = 'fixed', v2_max = 1000, pool_size = DEFAULT_POOL_SIZE):
+        """Initialize payload generator
+
+        Args:
+            v1_size (int, optional): Length of the v1 string. Defaults to 40.
+            v3_size (int, optional): Length of the v3 string. Defaults to 100.
+            size_distribution (str, optional): 'fixed' uses the sizes as is, 'uniform' picks lengths
+                uniformly between half and one and a half times the size. Defaults to 'fixed'.
+            v2_max (int, optional): v2 is picked uniformly in [0, v2_max). Defaults to 1000.
+            pool_size (int, optional): Characters generated per pool refill. Defaults to DEFAULT_POOL_SIZE.
+        """
+        if (size_distribution not in self.SIZE_DISTRIBUTIONS):
+            raise Exception(f'Unknown payload size distribution: {size_distribution}')
+        self.v1_size = v1_size
+        self.v3_size = v3_size
+        self.size_distribution = size_distribution
+        self.v2_max = v2_max
+        self.pool_size = max(pool_size, 2 * (v1_size + v3_size))
+        self._pool = ''
+        self._pos = 0
+
+    def _refill(self, length):
+        self._pool = os.urandom(max(self.pool_size, length)).translate(_TRANSLATION).decode('ascii')
+        self._pos = 0
+
+    def _length(self, size):
+        if (self.size_distribution == 'uniform'):
+            return random.randint(size // 2, size + size // 2)
+        return size
+
+    def _mean_length(self, size):
+        if (self.size_distribution == 'uniform'):
+            return (size // 2 + size + size // 2) / 2
+        return size
+
+    def mean_row_bytes(self):
+        """Returns the mean size of a row as COPY text: v1, v2 and v3 separated by tabs and ended by a newline"""
+        # Mean number of digits of v2, counted over each power of ten below v2_max
+        v2_digits = 0
+        low, high, digits = 0, 10, 1
+        while (low < self.v2_max):
+            v2_digits += digits * (min(high, self.v2_max) - low)
+            low, high, digits = high, high * 10, digits + 1
+        return self._mean_length(self.v1_size) + v2_digits / max(self.v2_max, 1) + self._mean_length(self.v3_size) + 3
+
+    def random_string(self, length):
+        # Consume the pool sequentially so payloads don't repeat until it is refilled
+        if (self._pos + length > len(self._pool)):
+            self._refill(length)
+        value = self._pool[self._pos:self._pos + length]
+        self._pos += length
+        return value
+
+    def row(self):
+        """Returns a (v1, v2, v3) tuple for a new row"""
+        return (self.random_string(self._length(self.v1_size)), random.randrange(self.v2_max), self.random_string(self._length(self.v3_size)))
@@ -0,0 +1,78 @@
+import json
+import logging
+import os
+
+""" The scalability databases and the tables in each of them, discovered once and optionally cached on disk.
+    A cached manifest is reused as long as the set of scalability databases and the catalog version of every
+    database still match, which takes two catalog queries on the initial database instead of a connection to every
+    database. Without catalog versions a table change can't be detected, so the manifest is always rediscovered.
+"""
+class SchemaManifest:
+    VERSION = 2
+
+    def __init__(self, databases, tables, catalog_versions = None):
+        """Initialize manifest
+
+        Args:
+            databases (list): Scalability database names, sorted by id
+            tables (dict): Scalability table names in each database, sorted by id
+            catalog_versions (list, optional): [database oid, catalog version] pairs the manifest was discovered at,
+                if the server reports them. Defaults to None.
+        """
+        self.databases = databases
+        self.tables = tables
+        self.catalog_versions = catalog_versions
+
+        # Tables that exist in every database, so that any of them can be used whichever database a session is connected to
+        common = set(tables[databases[0]]) if databases else set()
+        for dbname in databases[1:]:
+            common.intersection_update(tables[dbname])
+        self.common_tables = [name for name in tables[databases[0]] if name in common] if databases else []
+
+    @classmethod
+    def discover(cls, cluster_helper):
+        catalog_versions = cluster_helper.get_catalog_versions()
+        databases = cluster_helper.list_databases()
+        tables = cluster_helper.list_tables_by_database(databases)
+        return cls(databases, tables, catalog_versions)
+
+    def is_current(self, cluster_helper):
+        """Checks that the databases and the catalog version of every database haven't changed since the manifest was discovered"""
+        if (self.catalog_versions is None):
+            return False
+        return cluster_helper.get_catalog_versions() == self.catalog_versions and cluster_helper.list_databases() == self.databases
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'version': self.VERSION, 'catalog_versions': self.catalog_versions, 'databases': self.databases, 'tables': self.tables}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            manifest = json.load(f)
+        if (manifest.get('version') != cls.VERSION):
+            raise Exception(f'Unsupported schema manifest version in {path}')
+        return cls(manifest['databases'], manifest['tables'], manifest['catalog_versions'])
+
+    @classmethod
+    def load_or_discover(cls, cluster_helper, path = None):
+        """Returns the manifest cached at path if it is still current, otherwise discovers it (and caches it at path)
+
+        Args:
+            cluster_helper (ClusterHelper): Cluster helper
+            path (str, optional): Manifest cache file. Defaults to None to always discover.
+        """
+        if (path is not None and os.path.exists(path)):
+            try:
+                manifest = cls.load(path)
+                if (manifest.is_current(cluster_helper)):
+                    logging.info(f'Using schema manifest {path}')
+                    return manifest
+                logging.info(f'Schema manifest {path} is out of date, rediscovering')
+            except Exception as e:
+                logging.warning(f'Ignoring schema manifest {path}: {e}')
+
+        manifest = cls.discover(cluster_helper)
+        if (path is not None):
+            manifest.save(path)
+        return manifest
@@ -0,0 +1,133 @@
+import logging
+import sys
+import time
+from collections import Counter
+import gevent
+from gevent import monkey
+
+""" Watches the load generator itself, so that latency caused by a saturated generator isn't blamed on the database.
+    Each interval it samples the process CPU use, the gevent loop lag (how late a sleeping greenlet wakes up, which is
+    also how late closed loop tasks start after their wait time) and, in open loop mode, how late requests are released
+    compared to their schedule. Intervals where the generator is the bottleneck are logged and counted in a
+    'load_generator' / 'saturated' stats entry, so they stand out in the stats and CSV history. The entry has no
+    failures or latency, so it doesn't count towards the error rate of the database requests.
+"""
+# Request type of the saturated intervals entry, which isn't a database request
+SATURATED_REQUEST_TYPE = 'load_generator'
+
+class SelfMonitor:
+    # Seconds between loop lag probes
+    LAG_PROBE_INTERVAL = 0.1
+
+    def __init__(self, environment, interval = 1, cpu_threshold = 90, lag_threshold_ms = 50, scheduler = None):
+        """Initialize self monitor
+
+        Args:
+            environment (Environment): Locust environment to report saturated intervals to
+            interval (int, optional): Seconds per sampled interval. Defaults to 1.
+            cpu_threshold (float, optional): Process CPU percent at or above which the generator counts as saturated. Defaults to 90.
+            lag_threshold_ms (float, optional): Loop lag or release delay at or above which the generator counts as saturated. Defaults to 50.
+            scheduler (ArrivalScheduler, optional): Open loop scheduler whose release delay is sampled. Defaults to None.
+        """
+        self.env = environment
+        self.interval = interval
+        self.cpu_threshold = cpu_threshold
+        self.lag_threshold_ms = lag_threshold_ms
+        self.scheduler = scheduler
+        self.num_intervals = 0
+        self.num_saturated = 0
+        self.max_cpu = 0
+        self.max_lag_ms = 0
+        self._interval_max_lag_ms = 0
+        self._greenlets = []
+
+    def start(self):
+        self._greenlets = [gevent.spawn(self._probe_lag), gevent.spawn(self._run)]
+
+    def stop(self):
+        gevent.killall(self._greenlets)
+        self._greenlets = []
+        logging.info(f'Load generator summary: {self.num_saturated} of {self.num_intervals} intervals saturated, '
+                     f'max CPU {self.max_cpu:.0f}%, max loop lag {self.max_lag_ms:.1f} ms')
+
+    def _probe_lag(self):
+        while True:
+            expected = time.perf_counter() + self.LAG_PROBE_INTERVAL
+            gevent.sleep(self.LAG_PROBE_INTERVAL)
+            lag_ms = (time.perf_counter() - expected) * 1000
+            if (lag_ms > self._interval_max_lag_ms):
+                self._interval_max_lag_ms = lag_ms
+
+    def _run(self):
+        last_wall = time.perf_counter()
+        last_cpu = time.process_time()
+        while True:
+            gevent.sleep(self.interval)
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            cpu_percent = (cpu - last_cpu) / (wall - last_wall) * 100
+            last_wall, last_cpu = wall, cpu
+
+            lag_ms = self._interval_max_lag_ms
+            self._interval_max_lag_ms = 0
+            release_delay_ms = self.scheduler.take_max_release_delay() if self.scheduler is not None else 0
+
+            self.num_intervals += 1
+            self.max_cpu = max(self.max_cpu, cpu_percent)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if (cpu_percent >= self.cpu_threshold or lag_ms >= self.lag_threshold_ms or release_delay_ms >= self.lag_threshold_ms):
+                self.num_saturated += 1
+                logging.warning(f'Load generator saturated, latencies in this interval are not reliable: CPU {cpu_percent:.0f}%, '
+                                f'loop lag {lag_ms:.1f} ms, open loop release delay {release_delay_ms:.1f} ms')
+                # Count-only stats entry
+                self.env.events.request.fire(request_type=SATURATED_REQUEST_TYPE, name='saturated', start_time=time.time(), response_time=0,
+                    response_length=0, exception=None, context=None, response=None)
+
+class SamplingProfiler:
+    def __init__(self, output_path, interval = 0.01):
+        """Samples the stack of whatever greenlet is running on the main thread from a separate OS thread, and writes
+        the samples in the collapsed stack format (one 'frame;frame;frame count' line per stack) used by flame graph tools
+
+        Args:
+            output_path (str): File to write collapsed stacks to
+            interval (float, optional): Seconds between samples. Defaults to 0.01.
+        """
+        self.output_path = output_path
+        self.interval = interval
+        self.samples = Counter()
+        self._stopped = False
+        self._done = None
+        self._main_thread_id = None
+
+    def start(self):
+        # A greenlet would only get to sample when the loop is idle, so sample from a real thread. threading.Thread
+        # can't be used even unpatched: its start() and join() wait on locks that gevent has patched.
+        self._main_thread_id = monkey.get_original('_thread', 'get_ident')()
+        self._stopped = False
+        self._done = monkey.get_original('_thread', 'allocate_lock')()
+        self._done.acquire()
+        monkey.get_original('_thread', 'start_new_thread')(self._sample, ())
+
+    def stop(self):
+        if (self._done is None):
+            return
+        self._stopped = True
+        self._done.acquire()
+        self._done = None
+        with open(self.output_path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+        logging.info(f'Wrote {sum(self.samples.values())} profiler samples to {self.output_path}')
+
+    def _sample(self):
+        sleep = monkey.get_original('time', 'sleep')
+        while not self._stopped:
+            frame = sys._current_frames().get(self._main_thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f'{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_code.co_firstlineno})')
+                frame = frame.f_back
+            if (stack):
+                self.samples[';'.join(reversed(stack))] += 1
+            sleep(self.interval)
+        self._done.release()
@@ -0,0 +1,163 @@
+import random
+import time
+import psycopg2
+import psycopg2.extensions
+from .cluster_helper import ClusterHelper
+
+""" A simulated database backend that stands in for YBConnection and psycopg2 connections, so that the runner itself
+    can be benchmarked without a cluster. Statements take a latency drawn from a configurable distribution (slept
+    cooperatively once gevent has patched time.sleep), connecting has its own cost, and a fraction of statements can
+    be made to fail. Catalog queries used by ClusterHelper are answered from a fixed set of scalability databases
+    and tables, so the real ClusterHelper and executors run unchanged on top of it.
+"""
+class LatencyModel:
+    DISTRIBUTIONS = ['fixed', 'uniform', 'exponential', 'lognormal']
+
+    def __init__(self, mean_ms, distribution = 'fixed'):
+        """Latency with the given mean
+
+        Args:
+            mean_ms (float): Mean latency in ms
+            distribution (str, optional): One of DISTRIBUTIONS. uniform spans 0 to twice the mean and lognormal has
+                a sigma of 1. Defaults to 'fixed'.
+        """
+        if (distribution not in self.DISTRIBUTIONS):
+            raise Exception(f'Unknown latency distribution: {distribution}')
+        self.mean_ms = mean_ms
+        self.distribution = distribution
+
+    def sample(self):
+        if (self.mean_ms <= 0):
+            return 0
+        if (self.distribution == 'uniform'):
+            return random.uniform(0, 2 * self.mean_ms)
+        elif (self.distribution == 'exponential'):
+            return random.expovariate(1 / self.mean_ms)
+        elif (self.distribution == 'lognormal'):
+            # mu chosen so that the mean is mean_ms with sigma 1
+            return random.lognormvariate(0, 1) * self.mean_ms / 1.6487212707
+        return self.mean_ms
+
+    def wait(self):
+        latency_ms = self.sample()
+        if (latency_ms > 0):
+            time.sleep(latency_ms / 1000)
+
+class _ConnectionInfo:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+class SimulatedCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.closed = False
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def execute(self, sql, params = None):
+        backend = self.connection.backend
+        self._rows = backend.catalog_rows(sql)
+        if (self._rows is not None):
+            return
+        backend.query_latency.wait()
+        if (backend.error_rate > 0 and random.random() < backend.error_rate):
+            raise psycopg2.OperationalError('Simulated error')
+        if ('RETURNING' in sql):
+            key = backend.next_key()
+            self._rows = [(key, key)]
+        elif (sql.lstrip().upper().startswith('SELECT')):
+            self._rows = [(1,)]
+        else:
+            self._rows = []
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        self.closed = True
+
+class SimulatedConnection:
+    def __init__(self, backend, dbname):
+        self.backend = backend
+        self.dbname = dbname
+        self.closed = 0
+        self.autocommit = False
+        self.info = _ConnectionInfo(backend.host, backend.port)
+
+    def set_session(self, autocommit = None):
+        if (autocommit is not None):
+            self.autocommit = autocommit
+
+    def cursor(self):
+        return SimulatedCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+class SimulatedYBConnection:
+    def __init__(self, num_databases = 1, num_tables = 10, query_latency = None, connect_latency = None, error_rate = 0):
+        """Drop-in replacement for YBConnection backed by the simulated backend
+
+        Args:
+            num_databases (int, optional): Number of scalability databases reported by the catalog. Defaults to 1.
+            num_tables (int, optional): Number of scalability tables in each database. Defaults to 10.
+            query_latency (LatencyModel, optional): Latency of each statement. Defaults to no latency.
+            connect_latency (LatencyModel, optional): Cost of opening a connection. Defaults to no latency.
+            error_rate (float, optional): Fraction of statements that fail. Defaults to 0.
+        """
+        self.host = '127.0.0.1'
+        self.port = 5433
+        self.dbuser = 'yugabyte'
+        self.dbpassword = 'yugabyte'
+        self.useipv6 = False
+        self.pool = None
+        self.load_balancer = None
+        self.query_latency = query_latency if query_latency is not None else LatencyModel(0)
+        self.connect_latency = connect_latency if connect_latency is not None else LatencyModel(0)
+        self.error_rate = error_rate
+        self.databases = [ClusterHelper.DB_NAME_PREFIX + str(i) for i in range(1, num_databases + 1)]
+        self.tables = [ClusterHelper.TABLE_NAME_PREFIX + str(i) for i in range(1, num_tables + 1)]
+        self._last_key = 0
+
+    @staticmethod
+    def enable_cooperative_wait():
+        pass
+
+    def next_key(self):
+        self._last_key += 1
+        return self._last_key
+
+    def catalog_rows(self, sql):
+        # Answers the catalog queries run by ClusterHelper, or returns None for workload statements
+        if ('pg_yb_catalog_version' in sql):
+            return [(1, 1)]
+        if ('pg_database' in sql):
+            names = self.databases
+        elif ('pg_tables' in sql or 'INFORMATION_SCHEMA.TABLES' in sql):
+            names = self.tables
+        else:
+            return None
+        return [(len(names),)] if 'COUNT(' in sql.upper() else [(name,) for name in names]
+
+    def connect_to_ysql(self, dbname, time_phases = False):
+        # Connects have no phases to time here
+        self.connect_latency.wait()
+        conn = SimulatedConnection(self, dbname)
+        conn.set_session(autocommit=True)
+        return conn
+
+    def get_connection(self, dbname):
+        return self.connect_to_ysql(dbname)
+
+    def release_connection(self, conn):
+        conn.close()
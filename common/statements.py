@@ -0,0 +1,67 @@
+import re
+import weakref
+from .timing_wrapper import TimingWrapper
+
+""" Parameterized workload statements, optionally executed as server-side prepared statements
+"""
+class Statement:
+    def __init__(self, name, sql, param_types = ()):
+        """Initialize statement
+
+        Args:
+            name (str): Statement name, combined with the table name to name the prepared statement
+            sql (str): SQL with a {table} placeholder and %s placeholders for bound parameters
+            param_types (tuple, optional): SQL types of the bound parameters. Defaults to ().
+        """
+        self.name = name
+        self.sql = sql
+        self.param_types = param_types
+        self.execute_sql = ', '.join(['%s'] * len(param_types))
+
+        # Server-side statements use numbered placeholders instead of %s
+        counter = iter(range(1, len(param_types) + 1))
+        self.prepare_sql = re.sub('%s', lambda m: f'${next(counter)}', sql)
+
+INSERT_ROW = Statement('insert_row', 'INSERT INTO {table} (v1, v2, v3) VALUES (%s, %s, %s)', ('varchar', 'int', 'text'))
+COUNT_ROWS = Statement('count_rows', 'SELECT count(*) FROM {table}')
+INSERT_ROW_RETURNING_KEYS = Statement('insert_row_returning_keys', 'INSERT INTO {table} (v1, v2, v3) VALUES (%s, %s, %s) RETURNING k, v4', ('varchar', 'int', 'text'))
+POINT_LOOKUP = Statement('point_lookup', 'SELECT k, v1, v2, v3, v4 FROM {table} WHERE k = %s', ('int',))
+UNIQUE_LOOKUP = Statement('unique_lookup', 'SELECT k, v1, v2, v3, v4 FROM {table} WHERE v4 = %s', ('int',))
+RANGE_SCAN = Statement('range_scan', 'SELECT k, v1, v2, v3, v4 FROM {table} WHERE k >= %s AND k < %s', ('int', 'int'))
+
+class StatementCache:
+    SIMPLE = 'simple'
+    PREPARED = 'prepared'
+    QUERY_MODES = [SIMPLE, PREPARED]
+
+    def __init__(self, query_mode = SIMPLE):
+        """Initialize statement cache
+
+        Args:
+            query_mode (str, optional): 'simple' sends the full statement with parameters on every call,
+                'prepared' prepares each statement once per connection and table and executes it by name. Defaults to 'simple'.
+        """
+        self.query_mode = query_mode
+
+        # Names of statements prepared on each connection. Entries disappear with the connection,
+        # so a new connection (or one borrowed from the pool) is prepared on first use.
+        self._prepared = weakref.WeakKeyDictionary()
+
+    def bind(self, environment, curs, statement, table_name, params = ()):
+        """Returns the SQL and parameters to execute statement against table_name on the cursor's connection
+
+        In prepared mode, the statement is prepared first if this connection has not seen it yet.
+        The PREPARE is reported under the 'prepare' request type so it doesn't skew the statement's own latency.
+        """
+        if (self.query_mode == self.SIMPLE):
+            return statement.sql.format(table=table_name), params or None
+
+        name = f'{statement.name}_{table_name}'
+        prepared = self._prepared.setdefault(curs.connection, set())
+        if (name not in prepared):
+            types = f" ({', '.join(statement.param_types)})" if statement.param_types else ''
+            TimingWrapper(environment, curs, 'prepare').execute(f'PREPARE {name}{types} AS {statement.prepare_sql.format(table=table_name)}')
+            prepared.add(name)
+
+        args = f' ({statement.execute_sql})' if statement.param_types else ''
+        return f'EXECUTE {name}{args}', params or None
@@ -1,28 +1,90 @@
 import time
 
 class TimingWrapper:
+    # Fire the request event for 1 in sample_rate calls. The other calls are logged straight into the
+    # locust stats, so stats stay complete while skipping event dispatch to the remaining listeners.
+    sample_rate = 1
+
+    # Optional callable returning the intended start (perf_counter) of the current request, or None.
+    # Set in open loop mode so latency includes the time a request waited to be started.
+    start_time_source = None
+
+    # Optional LatencyRecorder that every timed call is recorded into, regardless of sampling
+    recorder = None
+
     def __init__(self, environment, stub, request_type = None):
         self.env = environment
-        self._stub_class = stub.__class__
         self._stub = stub
         self._request_type = request_type
+        self._wrapped_names = []
+        self._node = self._get_node(stub)
+
+    @staticmethod
+    def _get_node(stub):
+        # Load balanced node of the connection a cursor belongs to, whose per-node request latency is recorded
+        return getattr(getattr(stub, 'connection', None), 'node', None)
+
+    @classmethod
+    def configure(cls, sample_rate = 1, start_time_source = None, recorder = None):
+        cls.sample_rate = max(int(sample_rate), 1)
+        cls.start_time_source = start_time_source
+        cls.recorder = recorder
+
+    def rebind(self, stub):
+        # Wrap a different stub (e.g. a new cursor), dropping the wrappers cached for the previous one
+        for name in self._wrapped_names:
+            del self.__dict__[name]
+        self._wrapped_names = []
+        self._stub = stub
+        self._node = self._get_node(stub)
 
     def __getattr__(self, name):
-        func = self._stub_class.__getattribute__(self._stub, name)
+        # Only called on first use of a method; the wrapper is cached on the instance afterwards
+        func = getattr(self._stub, name)
+        wrapper = self._make_wrapper(name, func)
+        self.__dict__[name] = wrapper
+        self._wrapped_names.append(name)
+        return wrapper
+
+    def _make_wrapper(self, name, func):
+        request_type = self._request_type
+        fire = self.env.events.request.fire
+        log_request = self.env.stats.log_request
+        perf_counter = time.perf_counter
+        node = self._node
+        request_meta = {
+            "request_type": request_type,
+            "name": name,
+            "start_time": 0,
+            "response_time": 0,
+            "response_length": 0,
+            "exception": None,
+            "context": None,
+            "response": None,
+        }
+        calls = 0
 
         def wrapper(*args, **kwargs):
-            request_meta = {
-                "request_type": self._request_type,
-                "name": name,
-                "start_time": time.time(),
-                "response_length": 0,
-                "exception": None,
-                "context": None,
-                "response": None,
-            }
-            start_perf_counter = time.perf_counter()
+            nonlocal calls
+            start_perf_counter = perf_counter()
             ret = func(*args, **kwargs)
-            request_meta["response_time"] = (time.perf_counter() - start_perf_counter) * 1000
-            self.env.events.request.fire(**request_meta)
-            return ret, request_meta["response_time"]
+            end_perf_counter = perf_counter()
+            if (TimingWrapper.start_time_source is not None):
+                intended_start = TimingWrapper.start_time_source()
+                if (intended_start is not None and intended_start < start_perf_counter):
+                    start_perf_counter = intended_start
+            response_time = (end_perf_counter - start_perf_counter) * 1000
+            if (TimingWrapper.recorder is not None):
+                TimingWrapper.recorder.record(request_type, name, response_time)
+            if (node is not None):
+                node.record_request(response_time)
+            calls += 1
+            if (calls >= TimingWrapper.sample_rate):
+                calls = 0
+                request_meta["start_time"] = time.time() - response_time / 1000
+                request_meta["response_time"] = response_time
+                fire(**request_meta)
+            else:
+                log_request(request_type, name, response_time, 0)
+            return ret, response_time
         return wrapper
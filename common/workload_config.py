@@ -6,5 +6,14 @@ class WorkloadConfig:
         self.num_databases = 0
         self.num_tables = 0
         self.cluster_helper = None
+        self.statements = None
+        self.payload = None
+        self.key_tracker = None
+        self.range_scan_size = 100
+        self.batch_size = 10
+        self.isolation_level = 'read_committed'
+        self.max_retries = 3
+        self.ddl_mix = {}
+        self.ddl_rate = 1
 
-workload_config = WorkloadConfig
+workload_config = WorkloadConfig()
@@ -1,14 +1,73 @@
+import logging
+import re
+import select
 import socket
+import time
 import psycopg2
-import psycopg2.extras
+import psycopg2.extensions
+from .connection_pool import ConnectionPool
+from .load_balancer import LoadBalancer, Node, parse_hosts
+
+# SQLSTATE classes of errors meaning the node can't take connections: connection exception, insufficient
+# resources and operator intervention (e.g. shutting down)
+NODE_FAILURE_SQLSTATE_CLASSES = ('08', '53', '57')
+
+# Severity libpq prefixes to an error the server sent while connecting, e.g. 'FATAL:  password authentication failed'
+_SERVER_ERROR = re.compile(r'\b(FATAL|PANIC):')
+
+def _is_node_failure(error):
+    if (error.pgcode is not None):
+        return error.pgcode[:2] in NODE_FAILURE_SQLSTATE_CLASSES
+    # libpq reports connect errors without a SQLSTATE. An error sent by the server (bad password, unknown database,
+    # too many connections) means the node is up and the same connect would fail on any node; anything else means
+    # the node couldn't be reached (refused, timed out, unresolvable)
+    return _SERVER_ERROR.search(str(error)) is None
+
+class _BalancedConnection(psycopg2.extensions.connection):
+    # Tells the load balancer when the connection is closed so that per-node connection counts stay accurate
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.load_balancer = None
+        self.node = None
+
+    def close(self):
+        if (self.node is not None):
+            self.load_balancer.on_close(self.node)
+            self.node = None
+        super().close()
+
+class _PhaseTimedConnection(_BalancedConnection):
+    # Records when connecting started, when the TCP handshake completed (seen by _wait_select) and when the
+    # connection was ready, all on this one connection
+    def __init__(self, *args, **kwargs):
+        self.connect_started = time.perf_counter()
+        self.tcp_connected = None
+        super().__init__(*args, **kwargs)
+        self.connected = time.perf_counter()
+
+def _wait_select(conn):
+    # psycopg2.extras.wait_select, which also records when a phase timed connection completed its TCP handshake:
+    # the first time libpq waits for the socket to become writable is for its non-blocking connect() to complete
+    while True:
+        state = conn.poll()
+        if (state == psycopg2.extensions.POLL_OK):
+            return
+        if (state == psycopg2.extensions.POLL_READ):
+            select.select([conn.fileno()], [], [])
+        elif (state == psycopg2.extensions.POLL_WRITE):
+            select.select([], [conn.fileno()], [])
+            if (isinstance(conn, _PhaseTimedConnection) and conn.tcp_connected is None):
+                conn.tcp_connected = time.perf_counter()
+        else:
+            raise psycopg2.OperationalError(f'Bad state from poll: {state}')
 
 class YBConnection:
     def __init__(self, host, port, dbuser, dbpassword, useipv6 = False):
         """Initialize connection object
 
         Args:
-            host (str): Host (if None, default to localhost)
-            port (str): Port (if None, default to 5433)
+            host (str): Host, or comma separated list of host or host:port to balance connections across (if None, default to localhost)
+            port (str): Port of hosts listed without one (if None, default to 5433)
             dbuser (str): User name
             dbpassword (str): Password
             useipv6 (bool, optional): Whether to use ipv6. Defaults to False.
@@ -17,8 +76,13 @@ class YBConnection:
         self.dbpassword = dbpassword
         self.useipv6 = useipv6
         self.ysql_session = None
-        self.host = host if host is not None else self._get_local_ipaddr()
+        self.pool = None
+        self.load_balancer = None
         self.port = port if port is not None else 5433
+        self.nodes = parse_hosts(host, self.port) if host is not None else [Node(self._get_local_ipaddr(), self.port)]
+        # Connections go to the first node unless load balancing is enabled
+        self.host = self.nodes[0].host
+        self.port = self.nodes[0].port
 
     def _get_local_ipaddr(self):
         # Get the local ipv4 or ipv6 address of YW API
@@ -33,26 +97,121 @@ class YBConnection:
             sock.close()
         return api_address
 
-    def connect_to_ysql(self, dbname):
+    @staticmethod
+    def enable_cooperative_wait():
+        # psycopg2 otherwise blocks inside libpq while waiting on the server, stalling every other greenlet.
+        # Waiting through select() lets the gevent-patched select yield to the hub instead.
+        psycopg2.extensions.set_wait_callback(_wait_select)
+
+    def _connect(self, dbname, host, port, connection_factory = None):
         # Connect to ysql
         sslmode = None
         sslrootcert = None
         sslcert = None
         sslkey = None
-        conn = None
+        conn = psycopg2.connect(database=dbname,
+                                user=self.dbuser,
+                                password=self.dbpassword,
+                                host=host,
+                                port=port,
+                                sslmode=sslmode,
+                                sslrootcert=sslrootcert,
+                                sslcert=sslcert,
+                                sslkey=sslkey,
+                                connection_factory=connection_factory)
+
+        # Default to auto-commit
+        conn.set_session(autocommit=True)
+        return conn
+
+    def _connect_to_node(self, dbname, connection_factory):
+        # Try each node at most once, taking nodes that can't be reached out of rotation
+        error = None
+        for _ in range(len(self.load_balancer.nodes)):
+            node = self.load_balancer.pick()
+            start_perf_counter = time.perf_counter()
+            try:
+                conn = self._connect(dbname, node.host, node.port, connection_factory)
+            except psycopg2.OperationalError as pg_ex:
+                if (not _is_node_failure(pg_ex)):
+                    raise
+                self.load_balancer.on_failure(node, pg_ex)
+                error = pg_ex
+                continue
+            self.load_balancer.on_connect(node, (time.perf_counter() - start_perf_counter) * 1000)
+            conn.load_balancer = self.load_balancer
+            conn.node = node
+            return conn
+        raise error
+
+    def connect_to_ysql(self, dbname, time_phases = False):
+        """Connects to dbname, on a node picked by the load balancer if load balancing is enabled
+
+        Args:
+            dbname (str): Database to connect to
+            time_phases (bool, optional): Record the connect_started, tcp_connected and connected perf_counter times
+                on the connection. tcp_connected is only seen once cooperative waits are enabled, and is None otherwise. Defaults to False.
+        """
+        connection_factory = _PhaseTimedConnection if time_phases else None
         try:
-            conn = psycopg2.connect(database=dbname,
-                                    user=self.dbuser,
-                                    password=self.dbpassword,
-                                    host=self.host,
-                                    port=self.port,
-                                    sslmode=sslmode,
-                                    sslrootcert=sslrootcert,
-                                    sslcert=sslcert,
-                                    sslkey=sslkey)
-
-            # Default to auto-commit
-            conn.set_session(autocommit=True)
+            if (self.load_balancer is not None):
+                return self._connect_to_node(dbname, connection_factory or _BalancedConnection)
+            return self._connect(dbname, self.host, self.port, connection_factory)
         except psycopg2.OperationalError as pg_ex:
             raise Exception(f'Failed to connect to YSQL: {pg_ex}') from pg_ex
-        return conn
\ No newline at end of file
+
+    def connect_to_node(self, dbname, node):
+        # Connects to a specific node, bypassing load balancing
+        try:
+            return self._connect(dbname, node.host, node.port)
+        except psycopg2.OperationalError as pg_ex:
+            raise Exception(f'Failed to connect to YSQL on {node}: {pg_ex}') from pg_ex
+
+    def _discover_nodes(self, dbname):
+        conn = self._connect(dbname, self.host, self.port)
+        try:
+            with conn.cursor() as curs:
+                curs.execute('SELECT host, port, cloud, region, zone FROM yb_servers()')
+                return [Node(host, port, cloud, region, zone) for host, port, cloud, region, zone in curs.fetchall()]
+        finally:
+            conn.close()
+
+    def enable_load_balancing(self, dbname, strategy, discover_nodes = False, preferred_zones = None, unhealthy_timeout = 30):
+        """Spread new connections across the nodes of the cluster
+
+        Args:
+            dbname (str): Database to connect to when discovering nodes
+            strategy (str): One of LoadBalancer.STRATEGIES
+            discover_nodes (bool, optional): Use the nodes listed by yb_servers() instead of the given hosts. Defaults to False.
+            preferred_zones (list, optional): Zones preferred by the zone strategy. Defaults to None.
+            unhealthy_timeout (int, optional): Seconds a node that can't be reached stays out of rotation. Defaults to 30.
+        """
+        if (discover_nodes):
+            self.nodes = self._discover_nodes(dbname)
+        self.load_balancer = LoadBalancer(self.nodes, strategy, preferred_zones, unhealthy_timeout)
+        logging.info(f'Balancing connections across {len(self.nodes)} nodes ({strategy}): {", ".join(str(node) for node in self.nodes)}')
+
+    def enable_pooling(self, min_size, max_size, max_databases, idle_timeout, acquire_timeout = 30):
+        """Switch get_connection / release_connection to pooled mode
+
+        Args:
+            min_size (int): Minimum connections kept per database
+            max_size (int): Maximum connections per database
+            max_databases (int): Maximum number of databases with pooled connections
+            idle_timeout (int): Seconds after which surplus idle connections are closed
+            acquire_timeout (int, optional): Seconds to wait for a connection to an exhausted database pool. Defaults to 30.
+        """
+        self.pool = ConnectionPool(self.connect_to_ysql, min_size, max_size, max_databases, idle_timeout, acquire_timeout=acquire_timeout)
+
+    def get_connection(self, dbname):
+        # Borrow from the pool if pooling is enabled, otherwise open a new connection
+        if (self.pool is not None):
+            return self.pool.acquire(dbname)
+        return self.connect_to_ysql(dbname)
+
+    def release_connection(self, conn):
+        # Return a connection obtained from get_connection
+        if (self.pool is not None):
+            self.pool.release(conn)
+        else:
+            conn.close()
\ No newline at end of file
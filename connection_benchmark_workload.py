@@ -0,0 +1,63 @@
+import time
+from common.event_log import request_log, connect_log
+from common.timing_wrapper import TimingWrapper
+from locust import User, task, constant
+from common.workload_config import workload_config
+
+""" Ramps up idle connections (one per user) and breaks the time to establish each one into phases:
+    connect (full connection), tcp_connect (its TCP handshake), auth_startup (the rest of the same connect:
+    authentication and backend startup), first_query (a query that has to load the catalog cache of a table)
+    and warm_query (the same query again on the now warm connection). The handshake is observed through the
+    psycopg2 wait callback, so this workload enables cooperative waits.
+"""
+class ConnectionBenchmarkWorkload(User):
+    def __init__(self, environment):
+        super().__init__(environment)
+        self.conn = None
+        self.connect_timer = TimingWrapper(environment, workload_config.cluster_helper.ybconnection, 'connect')
+        self.first_query_timer = TimingWrapper(environment, None, 'first_query')
+        self.warm_query_timer = TimingWrapper(environment, None, 'warm_query')
+
+    # Connections stay idle, so only wake up occasionally
+    wait_time = constant(60)
+
+    @task
+    def idle(self):
+        """ Keep the connection open and idle """
+
+    def _report_phase(self, request_type, response_time):
+        self.environment.events.request.fire(request_type=request_type, name='connect_to_ysql', start_time=time.time(),
+                                             response_time=response_time, response_length=0, exception=None, context=None, response=None)
+
+    def on_start(self):
+        workload_config.cluster_helper.ybconnection.enable_cooperative_wait()
+        dbname = workload_config.cluster_helper.get_random_db_name(workload_config.num_databases)
+        self.conn, connect_ms = self.connect_timer.connect_to_ysql(dbname, True)
+
+        # Split the same connect at the end of its TCP handshake
+        tcp_connected = getattr(self.conn, 'tcp_connected', None)
+        if (tcp_connected is not None):
+            tcp_ms = (tcp_connected - self.conn.connect_started) * 1000
+            auth_startup_ms = (self.conn.connected - tcp_connected) * 1000
+            self._report_phase('tcp_connect', tcp_ms)
+            self._report_phase('auth_startup', auth_startup_ms)
+            connect_log.info('Connected to database %s. TCP: %d ms, auth and startup: %d ms, total: %d ms', dbname, tcp_ms, auth_startup_ms, connect_ms)
+        else:
+            connect_log.info('Connected to database %s. Total: %d ms', dbname, connect_ms)
+
+        # Plain SQL rather than a prepared statement, since preparing would warm the catalog cache first
+        sql = f'SELECT * FROM {workload_config.cluster_helper.get_random_table_name(workload_config.num_tables)} LIMIT 1'
+        try:
+            with self.conn.cursor() as curs:
+                self.first_query_timer.rebind(curs)
+                ret, first_ms = self.first_query_timer.execute(sql)
+                self.warm_query_timer.rebind(curs)
+                ret, warm_ms = self.warm_query_timer.execute(sql)
+            request_log.info('First query: %d ms, warm query: %d ms', first_ms, warm_ms)
+        except Exception as e:
+            request_log.error('Failed to run first query: %s', e)
+
+    def on_stop(self):
+        if (self.conn is not None):
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,136 @@
+import itertools
+import os
+import random
+import time
+from common.event_log import request_log, connect_log
+from common.timing_wrapper import TimingWrapper
+from locust import User, task
+from common.workload_config import workload_config
+
+""" A workload that churns the catalog with CREATE/ALTER/DROP TABLE, CREATE INDEX and CREATE/DROP DATABASE,
+    mixed by --ddl_mix weights at --ddl_rate operations per second per user, and meant to run alongside data workloads.
+    Each DDL type is reported as its own request type. Tables are created in a random scalability database and
+    databases with their own prefix, so they don't change the table and database counts data workloads pick from.
+"""
+# DDL types and their default weights
+DDL_TYPES = {'create_table': 20, 'alter_table': 20, 'create_index': 20, 'drop_table': 20, 'create_database': 5, 'drop_database': 5}
+# DDL types that act on a table or database the user created earlier
+TABLE_DDL_TYPES = ('alter_table', 'create_index', 'drop_table')
+DATABASE_DDL_TYPES = ('drop_database',)
+
+def parse_ddl_mix(value):
+    """Parses a comma separated list of ddl_type=weight, DDL types left out are not run"""
+    ddl_mix = {}
+    for entry in value.split(','):
+        ddl_type, weight = entry.split('=')
+        if (ddl_type not in DDL_TYPES):
+            raise ValueError(f'Unknown DDL type: {ddl_type}')
+        ddl_mix[ddl_type] = float(weight)
+    return ddl_mix
+
+# Unique suffixes for object names across users and worker processes
+_ids = itertools.count(1)
+
+def _next_name(prefix):
+    return f'{prefix}{os.getpid()}_{next(_ids)}'
+
+class DDLChurnWorkload(User):
+    def __init__(self, environment):
+        super().__init__(environment)
+        self.conn = None
+        self.admin_conn = None
+        self.tables = []
+        self.databases = []
+        self.last_task_time = None
+        self.connect_timer = TimingWrapper(environment, workload_config.cluster_helper.ybconnection, 'connect')
+        self.timers = {ddl_type: TimingWrapper(environment, None, ddl_type) for ddl_type in DDL_TYPES}
+
+    def wait_time(self):
+        # Pace each user at ddl_rate operations per second, however long the DDL itself took
+        now = time.monotonic()
+        interval = 1 / workload_config.ddl_rate
+        wait = interval if self.last_task_time is None else max(interval - (now - self.last_task_time), 0)
+        self.last_task_time = now + wait
+        return wait
+
+    def _execute(self, ddl_type, sql):
+        start_time = time.time()
+        start_perf_counter = time.perf_counter()
+        try:
+            ret, latency_ms = self.timers[ddl_type].execute(sql)
+            request_log.info('%s. Latency: %d ms', sql, latency_ms)
+            return True
+        except Exception as e:
+            self.environment.events.request.fire(request_type=ddl_type, name='execute', start_time=start_time,
+                                                 response_time=(time.perf_counter() - start_perf_counter) * 1000,
+                                                 response_length=0, exception=e, context=None, response=None)
+            request_log.error('Failed to %s: %s', ddl_type.replace('_', ' '), e)
+            return False
+
+    def _can_run(self, ddl_type):
+        if (ddl_type in TABLE_DDL_TYPES):
+            return bool(self.tables)
+        if (ddl_type in DATABASE_DDL_TYPES):
+            return bool(self.databases)
+        return True
+
+    @task
+    def run_ddl(self):
+        # DDL types with nothing to act on yet are left out of the draw, instead of running some other DDL in their place
+        ddl_mix = {ddl_type: weight for ddl_type, weight in workload_config.ddl_mix.items() if weight > 0 and self._can_run(ddl_type)}
+        if (not ddl_mix):
+            return
+        ddl_type = random.choices(list(ddl_mix.keys()), list(ddl_mix.values()))[0]
+        getattr(self, ddl_type)()
+
+    def create_table(self):
+        table_name = _next_name(workload_config.cluster_helper.CHURN_TABLE_NAME_PREFIX)
+        if (self._execute('create_table', f'CREATE TABLE {table_name} (k SERIAL PRIMARY KEY, v1 VARCHAR, v2 INT, v3 TEXT)')):
+            self.tables.append(table_name)
+
+    def alter_table(self):
+        self._execute('alter_table', f'ALTER TABLE {random.choice(self.tables)} ADD COLUMN c{next(_ids)} INT')
+
+    def create_index(self):
+        table_name = random.choice(self.tables)
+        self._execute('create_index', f'CREATE INDEX {table_name}_idx{next(_ids)} ON {table_name} (v2)')
+
+    def drop_table(self):
+        # Drop the oldest table, which has accumulated the most columns and indexes
+        if (self._execute('drop_table', f'DROP TABLE {self.tables[0]}')):
+            self.tables.pop(0)
+
+    def create_database(self):
+        dbname = _next_name(workload_config.cluster_helper.CHURN_DB_NAME_PREFIX)
+        if (self._execute('create_database', f'CREATE DATABASE {dbname} WITH colocated = true')):
+            self.databases.append(dbname)
+
+    def drop_database(self):
+        if (self._execute('drop_database', f'DROP DATABASE {self.databases[0]}')):
+            self.databases.pop(0)
+
+    def on_start(self):
+        # Table DDL goes to a random scalability database, database DDL to the initial database
+        dbname = workload_config.cluster_helper.get_random_db_name(workload_config.num_databases)
+        self.conn, latency_ms = self.connect_timer.connect_to_ysql(dbname)
+        connect_log.info('Connected to database %s. Latency: %d', dbname, latency_ms)
+        self.admin_conn, latency_ms = self.connect_timer.connect_to_ysql(workload_config.cluster_helper.init_dbname)
+
+        curs = self.conn.cursor()
+        admin_curs = self.admin_conn.cursor()
+        for ddl_type, timer in self.timers.items():
+            timer.rebind(admin_curs if ddl_type.endswith('_database') else curs)
+
+    def on_stop(self):
+        # Drop whatever this user created so the catalog returns to its original size
+        for table_name in self.tables:
+            self._execute('drop_table', f'DROP TABLE IF EXISTS {table_name}')
+        for dbname in self.databases:
+            self._execute('drop_database', f'DROP DATABASE IF EXISTS {dbname}')
+        self.tables = []
+        self.databases = []
+        for conn in (self.conn, self.admin_conn):
+            if (conn is not None):
+                conn.close()
+        self.conn = None
+        self.admin_conn = None
@@ -1,4 +1,4 @@
-import logging
+from common.event_log import connect_log
 from common.timing_wrapper import TimingWrapper
 from locust import User, task
 from common.workload_config import workload_config
@@ -22,10 +22,10 @@ class IdleConnectionsWorkload(User):
         global num_connections
 
         # Connect to database
-        dbname = workload_config.cluster_helper.get_db_name(1)
+        dbname = workload_config.cluster_helper.get_db_name_at(1)
         self.conn, latency_ms = self.ybconnection.connect_to_ysql(dbname)
 
-        logging.info(f'Spawned connection #{num_connections}. Latency: {int(latency_ms)} ms')
+        connect_log.info('Spawned connection #%s. Latency: %d ms', num_connections, latency_ms)
         num_connections = num_connections + 1
 
     def on_start(self):
@@ -34,7 +34,7 @@ class IdleConnectionsWorkload(User):
     def on_stop(self):
         global num_connections
         num_connections = num_connections - 1
-        logging.info(f'Closed connection #{num_connections}')
+        connect_log.info('Closed connection #%s', num_connections)
         if (self.conn is not None):
             self.conn.close()
             self.conn = None
\ No newline at end of file
@@ -0,0 +1,107 @@
+import time
+from common.event_log import request_log, connect_log
+from common.timing_wrapper import TimingWrapper
+from common.statements import INSERT_ROW_RETURNING_KEYS, POINT_LOOKUP, RANGE_SCAN, UNIQUE_LOOKUP
+from locust import User, task, between
+from common.workload_config import workload_config
+
+""" A workload that reads rows by primary key, by the v4 unique index and by bounded primary key ranges.
+    Keys come from the in-memory key tracker (seeded with --keys_per_table and grown by this workload's inserts),
+    so lookups hit existing rows and their cost doesn't grow with table size the way count(*) does. Lookups that
+    find no row (e.g. a gap in the loaded keys) are also counted as 'not_found' so misses can't pass for hits.
+"""
+class KeyLookupWorkload(User):
+    def __init__(self, environment):
+        super().__init__(environment)
+        self.conn = None
+        self.curs = None
+        self.dbname = None
+        self.connect_timer = TimingWrapper(environment, workload_config.cluster_helper.ybconnection, 'connect')
+        self.insert_timer = TimingWrapper(environment, None, 'insert_row')
+        self.point_lookup_timer = TimingWrapper(environment, None, 'point_lookup')
+        self.unique_lookup_timer = TimingWrapper(environment, None, 'unique_lookup')
+        self.range_scan_timer = TimingWrapper(environment, None, 'range_scan')
+
+    # Wait time between each task
+    wait_time = between(0.1, 0.5)
+
+    def _lookup(self, timer, statement, column, description):
+        table_name = workload_config.cluster_helper.get_random_table_name(workload_config.num_tables)
+        key = workload_config.key_tracker.random_key(self.dbname, table_name, column)
+        if (key is None):
+            # Nothing known to exist yet, so create a row to look up later
+            self._insert(table_name)
+            return
+        try:
+            params = (key, key + workload_config.range_scan_size) if statement is RANGE_SCAN else (key,)
+            sql, params = workload_config.statements.bind(self.environment, self.curs, statement, table_name, params)
+            ret, latency_ms = timer.execute(sql, params)
+            if (self.curs.fetchone() is None):
+                self._report_not_found(statement)
+            request_log.info('%s %s in table %s. Latency: %d ms', description, key, table_name, latency_ms)
+        except Exception as e:
+            request_log.error('Failed to %s: %s', description.lower(), e)
+
+    def _report_not_found(self, statement):
+        # Count-only stats entry
+        self.environment.events.request.fire(request_type='not_found', name=statement.name, start_time=time.time(), response_time=0,
+                                             response_length=0, exception=None, context=None, response=None)
+
+    def _insert(self, table_name):
+        try:
+            sql, params = workload_config.statements.bind(self.environment, self.curs, INSERT_ROW_RETURNING_KEYS, table_name, workload_config.payload.row())
+            ret, latency_ms = self.insert_timer.execute(sql, params)
+            k, v4 = self.curs.fetchone()
+            workload_config.key_tracker.add_key(self.dbname, table_name, k, 'k')
+            workload_config.key_tracker.add_key(self.dbname, table_name, v4, 'v4')
+            request_log.info('Inserted row %s into table %s. Latency: %d ms', k, table_name, latency_ms)
+        except Exception as e:
+            request_log.error('Failed to insert row: %s', e)
+
+    @task(50)
+    def point_lookup(self):
+        self._lookup(self.point_lookup_timer, POINT_LOOKUP, 'k', 'Looked up key')
+
+    @task(20)
+    def unique_lookup(self):
+        self._lookup(self.unique_lookup_timer, UNIQUE_LOOKUP, 'v4', 'Looked up v4')
+
+    @task(20)
+    def range_scan(self):
+        self._lookup(self.range_scan_timer, RANGE_SCAN, 'k', 'Scanned range from key')
+
+    @task(10)
+    def insert_row(self):
+        self._insert(workload_config.cluster_helper.get_random_table_name(workload_config.num_tables))
+
+    @task(1)
+    def change_app(self):
+        # If only one database, this is a no-op
+        if (self.conn is not None and workload_config.num_databases == 1):
+            return
+
+        # Change the tenant app
+        self._release_connection()
+
+        self.dbname = workload_config.cluster_helper.get_random_db_name(workload_config.num_databases)
+        self.conn, latency_ms = self.connect_timer.get_connection(self.dbname)
+
+        # Reuse a single cursor (and its cached timing wrappers) until the connection changes
+        self.curs = self.conn.cursor()
+        for timer in [self.insert_timer, self.point_lookup_timer, self.unique_lookup_timer, self.range_scan_timer]:
+            timer.rebind(self.curs)
+        connect_log.info('Connected to database %s. Latency: %d', self.dbname, latency_ms)
+
+    def on_start(self):
+        self.change_app()
+
+    def _release_connection(self):
+        if (self.curs is not None):
+            self.curs.close()
+            self.curs = None
+        if (self.conn is not None):
+            workload_config.cluster_helper.ybconnection.release_connection(self.conn)
+            self.conn = None
+
+    def on_stop(self):
+        self._release_connection()
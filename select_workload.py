@@ -1,6 +1,7 @@
-import logging
 import random
+from common.event_log import request_log, connect_log
 from common.timing_wrapper import TimingWrapper
+from common.statements import COUNT_ROWS
 from locust import User, task, between
 from common.workload_config import workload_config
 
@@ -10,6 +11,9 @@ class SelectWorkload(User):
     def __init__(self, environment):
         super().__init__(environment)
         self.conn = None
+        self.curs = None
+        self.connect_timer = TimingWrapper(environment, workload_config.cluster_helper.ybconnection, 'connect')
+        self.select_timer = TimingWrapper(environment, None, 'select')
 
     # Wait time between each task
     wait_time = between(0.1, 0.5)
@@ -19,11 +23,11 @@ class SelectWorkload(User):
         # Reads from a random table
         table_name = workload_config.cluster_helper.get_random_table_name(workload_config.num_tables)
         try:
-            with self.conn.cursor() as curs:
-                ret, latency_ms = TimingWrapper(self.environment, curs, 'select').execute(f'SELECT count(*) FROM {table_name}')
-                logging.info(f'Selected from table {table_name}. Latency: {int(latency_ms)} ms')
+            sql, params = workload_config.statements.bind(self.environment, self.curs, COUNT_ROWS, table_name)
+            ret, latency_ms = self.select_timer.execute(sql, params)
+            request_log.info('Selected from table %s. Latency: %d ms', table_name, latency_ms)
         except Exception as e:
-            logging.error(f'Failed to select from row: {e}')
+            request_log.error('Failed to select from row: %s', e)
 
     @task(1)
     def change_app(self):
@@ -32,17 +36,26 @@ class SelectWorkload(User):
             return
 
         # Change the tenant app
-        if (self.conn is not None):
-            self.conn.close()
+        self._release_connection()
 
         dbname = workload_config.cluster_helper.get_random_db_name(workload_config.num_databases)
-        self.conn, latency_ms = TimingWrapper(self.environment, workload_config.cluster_helper.ybconnection, 'connect').connect_to_ysql(dbname)
-        logging.info(f'Connected to database {dbname}. Latency: {int(latency_ms)}')
+        self.conn, latency_ms = self.connect_timer.get_connection(dbname)
+
+        # Reuse a single cursor (and its cached timing wrappers) until the connection changes
+        self.curs = self.conn.cursor()
+        self.select_timer.rebind(self.curs)
+        connect_log.info('Connected to database %s. Latency: %d', dbname, latency_ms)
 
     def on_start(self):
         self.change_app()
 
-    def on_stop(self):
+    def _release_connection(self):
+        if (self.curs is not None):
+            self.curs.close()
+            self.curs = None
         if (self.conn is not None):
-            self.conn.close()
-            self.conn = None
\ No newline at end of file
+            workload_config.cluster_helper.ybconnection.release_connection(self.conn)
+            self.conn = None
+
+    def on_stop(self):
+        self._release_connection()
\ No newline at end of file
@@ -1,6 +1,6 @@
-import logging
-import random
+from common.event_log import request_log, connect_log
 from common.timing_wrapper import TimingWrapper
+from common.statements import COUNT_ROWS, INSERT_ROW
 from locust import User, task, between
 from common.workload_config import workload_config
 
@@ -11,35 +11,36 @@ class SimpleWorkloadSequentialAccess(User):
         super().__init__(environment)
         self.cur_table = 1
         self.conn = None
-
-    def _random_string(self,length):
-       return ''.join(random.choice('abcdefghijklmnopqrstuvwxyz') for i in range(length))
+        self.curs = None
+        self.connect_timer = TimingWrapper(environment, workload_config.cluster_helper.ybconnection, 'connect')
+        self.insert_timer = TimingWrapper(environment, None, 'insert_row')
+        self.select_timer = TimingWrapper(environment, None, 'select')
 
     @task(40)
     def insert_row(self):
         # Inserts a row into a table
-        table_name = workload_config.cluster_helper.get_table_name(self.cur_table)
+        table_name = workload_config.cluster_helper.get_table_name_at(self.cur_table)
         self.cur_table = (self.cur_table + 1) % workload_config.num_tables
         self.cur_table += 1 if (self.cur_table == 0) else 0
         try:
-            with self.conn.cursor() as curs:
-                ret, latency_ms = TimingWrapper(self.environment, curs, 'insert_row').execute(f"INSERT INTO {table_name} (v1, v2, v3) VALUES ('{self._random_string(40)}', {random.randrange(1000)}, '{self._random_string(100)}')")
-                logging.info(f'Inserted row into table {table_name}. Latency: {int(latency_ms)} ms')
+            sql, params = workload_config.statements.bind(self.environment, self.curs, INSERT_ROW, table_name, workload_config.payload.row())
+            ret, latency_ms = self.insert_timer.execute(sql, params)
+            request_log.info('Inserted row into table %s. Latency: %d ms', table_name, latency_ms)
         except Exception as e:
-            logging.error(f'Failed to insert row: {e}')
+            request_log.error('Failed to insert row: %s', e)
 
     @task(60)
     def read_row(self):
         # Reads from table
-        table_name = workload_config.cluster_helper.get_table_name(self.cur_table)
+        table_name = workload_config.cluster_helper.get_table_name_at(self.cur_table)
         self.cur_table = (self.cur_table + 1) % workload_config.num_tables
         self.cur_table += 1 if (self.cur_table == 0) else 0
         try:
-            with self.conn.cursor() as curs:
-                ret, latency_ms = TimingWrapper(self.environment, curs, 'select').execute(f'SELECT count(*) FROM {table_name}')
-                logging.info(f'Selected from table {table_name}. Latency: {int(latency_ms)} ms')
+            sql, params = workload_config.statements.bind(self.environment, self.curs, COUNT_ROWS, table_name)
+            ret, latency_ms = self.select_timer.execute(sql, params)
+            request_log.info('Selected from table %s. Latency: %d ms', table_name, latency_ms)
         except Exception as e:
-            logging.error(f'Failed to select from row: {e}')
+            request_log.error('Failed to select from row: %s', e)
 
     @task(1)
     def change_app(self):
@@ -48,17 +49,27 @@ class SimpleWorkloadSequentialAccess(User):
             return
 
         # Change the tenant app
-        if (self.conn is not None):
-            self.conn.close()
+        self._release_connection()
 
         dbname = workload_config.cluster_helper.get_random_db_name(workload_config.num_databases)
-        self.conn, latency_ms = TimingWrapper(self.environment, workload_config.cluster_helper.ybconnection, 'connect').connect_to_ysql(dbname)
-        logging.info(f'Connected to database {dbname}. Latency: {int(latency_ms)}')
+        self.conn, latency_ms = self.connect_timer.get_connection(dbname)
+
+        # Reuse a single cursor (and its cached timing wrappers) until the connection changes
+        self.curs = self.conn.cursor()
+        self.insert_timer.rebind(self.curs)
+        self.select_timer.rebind(self.curs)
+        connect_log.info('Connected to database %s. Latency: %d', dbname, latency_ms)
 
     def on_start(self):
         self.change_app()
 
-    def on_stop(self):
+    def _release_connection(self):
+        if (self.curs is not None):
+            self.curs.close()
+            self.curs = None
         if (self.conn is not None):
-            self.conn.close()
-            self.conn = None
\ No newline at end of file
+            workload_config.cluster_helper.ybconnection.release_connection(self.conn)
+            self.conn = None
+
+    def on_stop(self):
+        self._release_connection()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+
+pytest.importorskip('locust')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.capacity_search import CapacitySearch
+
+class _StalledRunner:
+    # Spawns users that never complete a request
+    def __init__(self):
+        self.user_count = 0
+        self.greenlet = self
+
+    def start(self, num_users, spawn_rate):
+        self.user_count = num_users
+
+    def quit(self):
+        pass
+
+    def join(self):
+        pass
+
+class _StalledEnvironment:
+    def __init__(self):
+        self.runner = _StalledRunner()
+        self.stats = self
+        self.entries = {}
+
+def test_stalled_stage_breaches_slo(tmp_path):
+    search = CapacitySearch(_StalledEnvironment(), 10, 10, 100, 10, 100, 0.01, str(tmp_path / 'capacity.csv'),
+                            window=0.01, max_stage_time=0)
+    search.run()
+
+    # The search stops at the first stage instead of stepping up past a stalled cluster
+    assert len(search.results) == 1
+    assert search.results[0].rps == 0
+    assert not search.results[0].passed
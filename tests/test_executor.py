@@ -0,0 +1,28 @@
+import os
+import sys
+import pytest
+
+pytest.importorskip('locust')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.cluster_helper import ClusterHelper
+from common.executor import Executor, ExecutorConfig
+from common.simulated_backend import LatencyModel, SimulatedYBConnection
+from simple_workload import SimpleWorkload
+
+def test_open_loop_local_runner(monkeypatch):
+    # Open loop mode replaces the workload's wait_time; restore it for other tests
+    monkeypatch.setattr(SimpleWorkload, 'wait_time', SimpleWorkload.wait_time)
+
+    ybconnection = SimulatedYBConnection(1, 10, LatencyModel(1))
+    executor = Executor(ClusterHelper(ybconnection, 'yugabyte'), [SimpleWorkload], None, ExecutorConfig(target_rps=100))
+    user_errors = []
+    executor.env.events.user_error.add_listener(lambda exception, **kwargs: user_errors.append(exception))
+
+    executor.execute(2, 2, 2)
+
+    assert user_errors == []
+    # Users keep picking up request slots after their first task
+    assert executor.scheduler.num_scheduled >= 100
+    num_statements = sum(entry.num_requests for entry in executor.env.stats.entries.values() if entry.method in ('insert_row', 'select'))
+    assert num_statements >= 100
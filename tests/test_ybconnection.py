@@ -0,0 +1,66 @@
+import os
+import struct
+import sys
+import pytest
+from gevent import monkey
+
+pytest.importorskip('psycopg2')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.ybconnection import YBConnection
+
+# Startup packet codes of the SSL and GSSAPI encryption requests libpq may send before the startup message
+ENCRYPTION_REQUEST_CODES = (80877103, 80877104)
+
+# libpq may block while connecting, so the server runs on a real thread with real sockets, even when locust has
+# monkey patched them
+start_new_thread = monkey.get_original('_thread', 'start_new_thread')
+Socket = monkey.get_original('socket', 'socket')
+
+def _serve_error(sock, sqlstate, message):
+    # Minimal server that declines encryption and answers the startup message with a FATAL error
+    conn, _ = sock.accept()
+    with conn:
+        while True:
+            length, code = struct.unpack('!ii', conn.recv(8))
+            if (code in ENCRYPTION_REQUEST_CODES):
+                conn.sendall(b'N')
+                continue
+            conn.recv(length - 8)
+            fields = b'SFATAL\x00VFATAL\x00C' + sqlstate.encode() + b'\x00M' + message.encode() + b'\x00\x00'
+            conn.sendall(b'E' + struct.pack('!i', len(fields) + 4) + fields)
+            return
+
+def _balanced_connection(port):
+    ybconnection = YBConnection(f'127.0.0.1:{port}', None, 'yugabyte', 'wrong', False)
+    ybconnection.enable_load_balancing('yugabyte', 'round_robin')
+    return ybconnection
+
+def test_server_error_keeps_node_in_rotation():
+    sock = Socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen()
+    start_new_thread(_serve_error, (sock, '28P01', 'password authentication failed for user "yugabyte"'))
+    ybconnection = _balanced_connection(sock.getsockname()[1])
+
+    with pytest.raises(Exception, match='password authentication failed'):
+        ybconnection.connect_to_ysql('yugabyte')
+    sock.close()
+
+    node = ybconnection.nodes[0]
+    assert node.num_failures == 0
+    assert node.unhealthy_until == 0
+
+def test_refused_connection_takes_node_out_of_rotation():
+    # A bound socket that isn't listening refuses connections
+    sock = Socket()
+    sock.bind(('127.0.0.1', 0))
+    ybconnection = _balanced_connection(sock.getsockname()[1])
+
+    with pytest.raises(Exception, match='Failed to connect'):
+        ybconnection.connect_to_ysql('yugabyte')
+    sock.close()
+
+    node = ybconnection.nodes[0]
+    assert node.num_failures == 1
+    assert node.unhealthy_until > 0
@@ -1,29 +1,65 @@
 import argparse
-import logging
+import os
+import sys
 from common.ybconnection import YBConnection
+from common.event_log import configure_logging
+from common.load_balancer import LoadBalancer
 from common.cluster_helper import ClusterHelper
-from common.executor import Executor
+from common.arguments import add_logging_arguments, add_payload_arguments, create_payload, add_distribution_arguments, set_access_distributions
+from common.executor import Executor, ExecutorConfig
+from common.data_loader import DataLoader
+from common.statements import StatementCache
+from common.latency_recorder import merge_histogram_logs
+from common.connection_memory import ConnectionMemorySampler
 from select_workload import SelectWorkload
 from simple_workload import SimpleWorkload
 from idle_connections_workload import IdleConnectionsWorkload
 from simple_workload_sequential_access import SimpleWorkloadSequentialAccess
+from key_lookup_workload import KeyLookupWorkload
+from batch_workload import BatchWorkload, ISOLATION_LEVELS
+from ddl_churn_workload import DDLChurnWorkload, DDL_TYPES, TABLE_DDL_TYPES, DATABASE_DDL_TYPES, parse_ddl_mix
+from connection_benchmark_workload import ConnectionBenchmarkWorkload
 
 class Main:
     # Example usage (see below for overrides):
     # Setup: python3 workload_runner.py setup --num_databases 1 --num_tables 500
+    # Load: python3 workload_runner.py load --rows_per_table 100000
     # Execute: python3 workload_runner.py execute --num_users 1000 --spawn_rate 20 --execution_time 600
+    # Execute on all cores: python3 workload_runner.py execute --num_users 1000 --spawn_rate 20 --execution_time 600 --processes
+    # Execute batched writes: python3 workload_runner.py execute --workload batch --batch_size 100 --isolation_level serializable
+    # Execute across nodes: python3 workload_runner.py --host node1,node2,node3 --load_balance least_connections execute --num_users 1000 --spawn_rate 20
+    # Execute with sampled request logging: python3 workload_runner.py --log_sample_rate 100 --log_buffered execute --num_users 1000 --spawn_rate 20
+    # Execute with DDL churn alongside: python3 workload_runner.py execute --workload simple ddl_churn --ddl_users 10 --ddl_rate 2 --num_users 1000 --spawn_rate 20
+    # Execute with live metrics: python3 workload_runner.py execute --num_users 1000 --spawn_rate 20 --metrics_port 9646 --metrics_file run1.lp
+    # Benchmark connections: python3 workload_runner.py execute --workload connection_benchmark --num_users 5000 --spawn_rate 50 --csv conn
+    # Find capacity: python3 workload_runner.py execute --find_capacity --num_users 2000 --capacity_step_users 100 --slo_p99_ms 50
+    # Execute open loop: python3 workload_runner.py execute --num_users 1000 --spawn_rate 100 --execution_time 600 --target_rps 500
+    # Merge latency histograms: python3 workload_runner.py merge_histograms run1_*.hlog --output merged.hlog
     # Clean up: python3 workload_runner.py cleanup
 
     def __init__(self):
         # List of available workloads
-        self.workloads = {'idle_connections': IdleConnectionsWorkload, 'simple' : SimpleWorkload, 'select': SelectWorkload, 'simple_sequential': SimpleWorkloadSequentialAccess}
+        self.workloads = {'idle_connections': IdleConnectionsWorkload, 'simple' : SimpleWorkload, 'select': SelectWorkload, 'simple_sequential': SimpleWorkloadSequentialAccess,
+                          'key_lookup': KeyLookupWorkload, 'batch': BatchWorkload,
+                          'ddl_churn': DDLChurnWorkload, 'connection_benchmark': ConnectionBenchmarkWorkload}
 
     def parse_arguments(self):
         parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
         parser.add_argument('--host', default=None,
-                            help="Host (default to localhost if not specified)")
+                            help="Host, or comma separated list of host[:port] to balance connections across (default to localhost if not specified)")
         parser.add_argument('--port', default=None,
                             help="Port (default to 5433 if not specified)")
+        parser.add_argument('--discover_nodes', action='store_true',
+                            help="Balance connections across the nodes listed by yb_servers() on the first host")
+        parser.add_argument('--load_balance', default='round_robin',
+                            choices=LoadBalancer.STRATEGIES,
+                            help="How connections are spread across nodes when there are several")
+        parser.add_argument('--preferred_zones', default=None,
+                            type=lambda zones: zones.split(','),
+                            help="Comma separated zones (zone or cloud.region.zone) preferred by the zone strategy")
+        parser.add_argument('--unhealthy_timeout', default=30,
+                            type=int,
+                            help="Seconds a node that can't be reached stays out of rotation")
         parser.add_argument('--dbuser', default="yugabyte",
                             help="Database user to connect as")
         parser.add_argument('--dbpass', default="yugabyte",
@@ -34,6 +70,8 @@ class Main:
                             type=str.lower,
                             help="Initial database to connect to")
 
+        add_logging_arguments(parser)
+
         subparsers = parser.add_subparsers(dest='command')
 
         parser_setup_cluster = subparsers.add_parser('setup',
@@ -45,16 +83,54 @@ class Main:
         parser_setup_cluster.add_argument('--num_tables', required=True,
                             type=int,
                             help="Number of tables to create per database")
+        parser_setup_cluster.add_argument('--parallelism', default=ClusterHelper.DEFAULT_PARALLELISM,
+                            type=int,
+                            help="Number of databases to set up concurrently")
+        parser_setup_cluster.add_argument('--ddl_batch_size', default=ClusterHelper.DEFAULT_DDL_BATCH_SIZE,
+                            type=int,
+                            help="Number of CREATE TABLE statements to send per transaction")
+
+        parser_load_data = subparsers.add_parser('load',
+                            formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                            help="Bulk load every table using COPY")
+        load_target = parser_load_data.add_mutually_exclusive_group(required=True)
+        load_target.add_argument('--rows_per_table',
+                            type=int,
+                            help="Number of rows to load each table up to")
+        load_target.add_argument('--mb_per_table',
+                            type=float,
+                            help="Approximate size in MB to load each table up to")
+        parser_load_data.add_argument('--batch_rows', default=DataLoader.DEFAULT_BATCH_ROWS,
+                            type=int,
+                            help="Number of rows per COPY statement")
+        parser_load_data.add_argument('--processes', default=os.cpu_count(),
+                            type=int,
+                            help="Number of loader processes")
+        add_payload_arguments(parser_load_data)
+        parser_load_data.add_argument('--schema_manifest', default=None,
+                            help="Cache the discovered databases and tables in this file and reuse it while the schema is unchanged")
+        parser_load_data.add_argument('--shard', default=None,
+                            type=int,
+                            help=argparse.SUPPRESS)
+        parser_load_data.add_argument('--num_shards', default=None,
+                            type=int,
+                            help=argparse.SUPPRESS)
+        parser_load_data.add_argument('--shard_result', default=None,
+                            help=argparse.SUPPRESS)
 
-        subparsers.add_parser('cleanup',
+        parser_clean_cluster = subparsers.add_parser('cleanup',
+                            formatter_class=argparse.ArgumentDefaultsHelpFormatter,
                             help="Cleanup cluster")
+        parser_clean_cluster.add_argument('--parallelism', default=ClusterHelper.DEFAULT_PARALLELISM,
+                            type=int,
+                            help="Number of databases to drop concurrently")
 
         parser_execute_workload = subparsers.add_parser('execute',
                             formatter_class=argparse.ArgumentDefaultsHelpFormatter,
                             help="Execute the workload")
         parser_execute_workload.add_argument('--workload',
-                            choices=self.workloads.keys(), required=True,
-                            help="Workload to run")
+                            choices=self.workloads.keys(), required=True, nargs='+',
+                            help="Workloads to run, users are split evenly between them (e.g. simple ddl_churn)")
         parser_execute_workload.add_argument('--num_users', default=100,
                             type=int,
                             help="Number of users")
@@ -66,6 +142,137 @@ class Main:
                             help="Execution time in secs")
         parser_execute_workload.add_argument('--csv', default=None,
                             help="CSV file base name")
+        parser_execute_workload.add_argument('--processes', default=None, nargs='?',
+                            type=int, const=os.cpu_count(),
+                            help="Run a local master with this many worker processes (number of cores if no value is given), or a single process if not specified")
+        parser_execute_workload.add_argument('--master_host', default=None,
+                            help=argparse.SUPPRESS)
+        parser_execute_workload.add_argument('--master_port', default=None,
+                            type=int,
+                            help=argparse.SUPPRESS)
+        parser_execute_workload.add_argument('--query_mode', default=StatementCache.SIMPLE,
+                            choices=StatementCache.QUERY_MODES,
+                            help="Send statements with bound parameters using the simple protocol, or as server-side prepared statements")
+        parser_execute_workload.add_argument('--timing_sample_rate', default=1,
+                            type=int,
+                            help="Dispatch request events to listeners for 1 in N timed calls; the rest are recorded directly into the stats")
+        parser_execute_workload.add_argument('--target_rps', default=None,
+                            type=float,
+                            help="Run open loop, starting requests at this rate regardless of response times (num_users bounds concurrency)")
+        parser_execute_workload.add_argument('--rps_ramp_time', default=0,
+                            type=int,
+                            help="Seconds to ramp linearly up to target_rps")
+        parser_execute_workload.add_argument('--max_backlog', default=None,
+                            type=int,
+                            help="Open loop requests allowed to wait for a free user before new ones are dropped (default: one second worth)")
+        parser_execute_workload.add_argument('--late_threshold_ms', default=10,
+                            type=float,
+                            help="Open loop requests starting later than this after their intended time are reported as late")
+        parser_execute_workload.add_argument('--hdr_log', default=None,
+                            help="Base name of the HDR interval histogram log to record latencies into (requires hdrh)")
+        parser_execute_workload.add_argument('--hdr_interval', default=10,
+                            type=int,
+                            help="Seconds covered by each interval histogram in the HDR log")
+        parser_execute_workload.add_argument('--metrics_port', default=None,
+                            type=int,
+                            help="Serve live metrics in the Prometheus format on this port at /metrics")
+        parser_execute_workload.add_argument('--metrics_file', default=None,
+                            help="Append live metrics to this file in the InfluxDB line protocol")
+        parser_execute_workload.add_argument('--metrics_interval', default=1,
+                            type=int,
+                            help="Seconds between live metrics snapshots")
+        parser_execute_workload.add_argument('--saturation_cpu_percent', default=90,
+                            type=float,
+                            help="Load generator CPU percent (per process) at which an interval is reported as saturated")
+        parser_execute_workload.add_argument('--saturation_lag_ms', default=50,
+                            type=float,
+                            help="Load generator event loop lag at which an interval is reported as saturated")
+        parser_execute_workload.add_argument('--profile_file', default=None,
+                            help="Base name of the file to write sampled load generator stacks to, in collapsed stack format")
+        parser_execute_workload.add_argument('--memory_sample_interval', default=5,
+                            type=int,
+                            help="Seconds between samples of memory per connection taken by the connection_benchmark workload")
+        parser_execute_workload.add_argument('--schema_manifest', default=None,
+                            help="Cache the discovered databases and tables in this file and reuse it while the schema is unchanged")
+        parser_execute_workload.add_argument('--find_capacity', action='store_true',
+                            help="Step up users from --capacity_start_users to --num_users until an SLO is breached, instead of running for --execution_time")
+        parser_execute_workload.add_argument('--capacity_start_users', default=10,
+                            type=int,
+                            help="Users in the first capacity search stage")
+        parser_execute_workload.add_argument('--capacity_step_users', default=10,
+                            type=int,
+                            help="Users added in each capacity search stage")
+        parser_execute_workload.add_argument('--capacity_window', default=10,
+                            type=int,
+                            help="Seconds per capacity search measurement window")
+        parser_execute_workload.add_argument('--capacity_max_stage_time', default=120,
+                            type=int,
+                            help="Seconds after which a capacity search stage that hasn't settled is measured anyway")
+        parser_execute_workload.add_argument('--capacity_settle_tolerance', default=0.05,
+                            type=float,
+                            help="Relative change in throughput and p99 between windows below which a stage has settled")
+        parser_execute_workload.add_argument('--slo_p99_ms', default=100,
+                            type=float,
+                            help="Highest acceptable p99 latency in the capacity search")
+        parser_execute_workload.add_argument('--slo_error_rate', default=0.01,
+                            type=float,
+                            help="Highest acceptable fraction of failed requests in the capacity search")
+        parser_execute_workload.add_argument('--capacity_result', default='capacity.csv',
+                            help="CSV file the capacity search writes per-stage results to")
+        parser_execute_workload.add_argument('--keys_per_table', default=0,
+                            type=int,
+                            help="Keys assumed to exist in every table for the key_lookup workload (e.g. --rows_per_table used with load)")
+        parser_execute_workload.add_argument('--range_scan_size', default=100,
+                            type=int,
+                            help="Number of primary keys covered by each range scan of the key_lookup workload")
+        parser_execute_workload.add_argument('--batch_size', default=10,
+                            type=int,
+                            help="Rows written per multi-row insert or explicit transaction by the batch workload")
+        parser_execute_workload.add_argument('--isolation_level', default='read_committed',
+                            choices=ISOLATION_LEVELS.keys(),
+                            help="Isolation level of the batch workload's explicit transactions")
+        parser_execute_workload.add_argument('--max_retries', default=3,
+                            type=int,
+                            help="Times a batch workload transaction that hit a conflict is retried")
+        parser_execute_workload.add_argument('--ddl_mix', default=dict(DDL_TYPES),
+                            type=parse_ddl_mix,
+                            help="Comma separated ddl_type=weight run by the ddl_churn workload, types: " + ", ".join(DDL_TYPES.keys())
+                                 + ". Types that act on an object the user hasn't created yet (" + ", ".join(TABLE_DDL_TYPES + DATABASE_DDL_TYPES)
+                                 + ") are left out of the draw until it has one")
+        parser_execute_workload.add_argument('--ddl_rate', default=1,
+                            type=float,
+                            help="DDL operations per second per ddl_churn user")
+        parser_execute_workload.add_argument('--ddl_users', default=None,
+                            type=int,
+                            help="Run exactly this many ddl_churn users instead of an even share of --num_users")
+        add_payload_arguments(parser_execute_workload)
+        add_distribution_arguments(parser_execute_workload)
+        parser_execute_workload.add_argument('--connection_mode', default='unpooled',
+                            choices=['unpooled', 'pooled'],
+                            help="Whether switching databases opens a new connection or borrows one from a per-database pool")
+        parser_execute_workload.add_argument('--pool_min_size', default=0,
+                            type=int,
+                            help="Minimum connections kept per database in pooled mode")
+        parser_execute_workload.add_argument('--pool_max_size', default=100,
+                            type=int,
+                            help="Maximum connections per database in pooled mode; users hold a connection, so more users per database wait for one")
+        parser_execute_workload.add_argument('--pool_max_databases', default=100,
+                            type=int,
+                            help="Maximum number of databases with pooled connections (least recently used are closed)")
+        parser_execute_workload.add_argument('--pool_idle_timeout', default=60,
+                            type=int,
+                            help="Seconds after which surplus idle pooled connections are closed")
+        parser_execute_workload.add_argument('--pool_acquire_timeout', default=30,
+                            type=int,
+                            help="Seconds to wait for a pooled connection before failing (the wait counts towards connect latency)")
+
+        parser_merge_histograms = subparsers.add_parser('merge_histograms',
+                            formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                            help="Merge HDR interval histogram logs from several processes or runs and report percentiles")
+        parser_merge_histograms.add_argument('logs', nargs='+',
+                            help="HDR interval histogram logs to merge")
+        parser_merge_histograms.add_argument('--output', default=None,
+                            help="Write the merged histograms to this log")
 
         args = parser.parse_args()
 
@@ -81,22 +288,75 @@ class Main:
         args = self.parse_arguments()
         if (args is None):
             return
+        configure_logging(args.log_level, args.log_event_levels, args.log_sample_rate, args.log_buffered)
+
+        # Merging histograms doesn't need the cluster
+        if (args.command == 'merge_histograms'):
+            merge_histogram_logs(args.logs, args.output)
+            return
 
         # Create yb connection object
         ybconnection = YBConnection(args.host, args.port, args.dbuser, args.dbpass, args.ipv6)
+        if (args.discover_nodes or len(ybconnection.nodes) > 1):
+            ybconnection.enable_load_balancing(args.initialdb, args.load_balance, args.discover_nodes, args.preferred_zones, args.unhealthy_timeout)
 
         cluster_helper = ClusterHelper(ybconnection, args.initialdb)
 
         if (args.command == 'setup'):
-            cluster_helper.setup_cluster(args.num_databases, args.num_tables)
+            cluster_helper.setup_cluster(args.num_databases, args.num_tables, args.parallelism, args.ddl_batch_size)
+        elif (args.command == 'load'):
+            data_loader = DataLoader(cluster_helper, create_payload(args))
+            rows_per_table = args.rows_per_table if args.rows_per_table is not None else data_loader.rows_for_size(args.mb_per_table)
+            # Loader processes are launched with the same arguments, plus the shard to load
+            data_loader.load(rows_per_table, args.batch_rows, args.processes, sys.argv, args.shard, args.num_shards, args.shard_result,
+                             schema_manifest=args.schema_manifest)
         elif (args.command == 'cleanup'):
-            cluster_helper.clean_cluster()
+            cluster_helper.clean_cluster(args.parallelism)
         elif (args.command == 'execute'):
-            workload_runner = Executor(cluster_helper, [self.workloads[args.workload]], args.csv)
-            workload_runner.execute(args.num_users, args.spawn_rate, args.execution_time)
+            if (args.find_capacity and args.target_rps is not None):
+                raise Exception('--find_capacity steps up users and can\'t be combined with --target_rps')
+            set_access_distributions(cluster_helper, args)
+            if (args.connection_mode == 'pooled'):
+                ybconnection.enable_pooling(args.pool_min_size, args.pool_max_size, args.pool_max_databases, args.pool_idle_timeout,
+                                            args.pool_acquire_timeout)
+            # Worker processes are launched with the same arguments, plus the master to connect to
+            if (args.ddl_users is not None):
+                DDLChurnWorkload.fixed_count = args.ddl_users
+            config = ExecutorConfig(query_mode=args.query_mode,
+                                    processes=args.processes, worker_args=sys.argv,
+                                    master_host=args.master_host, master_port=args.master_port,
+                                    timing_sample_rate=args.timing_sample_rate,
+                                    target_rps=args.target_rps, rps_ramp_time=args.rps_ramp_time,
+                                    max_backlog=args.max_backlog, late_threshold_ms=args.late_threshold_ms,
+                                    hdr_log=args.hdr_log, hdr_interval=args.hdr_interval,
+                                    payload=create_payload(args),
+                                    keys_per_table=args.keys_per_table, range_scan_size=args.range_scan_size,
+                                    batch_size=args.batch_size, isolation_level=args.isolation_level, max_retries=args.max_retries,
+                                    ddl_mix=args.ddl_mix, ddl_rate=args.ddl_rate,
+                                    metrics_port=args.metrics_port, metrics_file=args.metrics_file, metrics_interval=args.metrics_interval,
+                                    saturation_cpu_percent=args.saturation_cpu_percent, saturation_lag_ms=args.saturation_lag_ms,
+                                    profile_file=args.profile_file,
+                                    schema_manifest=args.schema_manifest)
+            workload_runner = Executor(cluster_helper, [self.workloads[name] for name in args.workload], args.csv, config)
+            # Memory per connection is sampled once, by the process that doesn't run users on behalf of a master
+            memory_sampler = None
+            if ('connection_benchmark' in args.workload and args.master_port is None):
+                memory_sampler = ConnectionMemorySampler(ybconnection, args.initialdb, args.memory_sample_interval,
+                                                         f'{args.csv}_connection_memory.csv' if args.csv is not None else None)
+                memory_sampler.start()
+            try:
+                if (args.find_capacity):
+                    workload_runner.find_capacity(args.capacity_start_users, args.capacity_step_users, args.num_users, args.spawn_rate,
+                                                  args.slo_p99_ms, args.slo_error_rate, args.capacity_result,
+                                                  window=args.capacity_window, max_stage_time=args.capacity_max_stage_time,
+                                                  settle_tolerance=args.capacity_settle_tolerance)
+                else:
+                    workload_runner.execute(args.num_users, args.spawn_rate, args.execution_time)
+            finally:
+                if (memory_sampler is not None):
+                    memory_sampler.stop()
         else:
             raise Exception(f'Unknown command {args.command}')
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
     Main().main()